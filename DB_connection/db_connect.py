@@ -1,9 +1,19 @@
 from config import DatabaseConfig
 from langchain_community.utilities.sql_database import SQLDatabase
 from db_connection_uri import create_database_uri
+from engine_registry import acquire_engine, release_engine
 
 
 def db_connect(config: DatabaseConfig):
+    """
+    SQLDatabase for a session on the shared engine for its URI. Returns
+    (db, engine_key); release_engine(engine_key) when the session closes.
+    """
     db_uri = create_database_uri(config)
-    db = SQLDatabase.from_uri(db_uri, include_tables=config.table_names)
-    return db
+    engine_key, engine = acquire_engine(db_uri)
+    try:
+        db = SQLDatabase(engine, include_tables=config.table_names)
+    except Exception:
+        release_engine(engine_key)
+        raise
+    return db, engine_key
@@ -0,0 +1,119 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+import threading
+import hashlib
+import logging
+import time
+import os
+
+logger = logging.getLogger("engine_registry")
+
+# Pool settings shared by every engine the registry creates
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# key -> {"engine", "label", "refs", "created_at"}
+_engines = {}
+_lock = threading.Lock()
+
+
+def engine_key(uri: str) -> str:
+    """Registry key for a URI; the credentials only ever appear hashed"""
+    return hashlib.sha256(uri.encode("utf-8")).hexdigest()
+
+
+def _create_engine(uri: str):
+    url = make_url(uri)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+
+    # In-memory SQLite uses a per-thread singleton pool with no sizing
+    in_memory = url.get_backend_name() == "sqlite" and url.database in (
+        None, "", ":memory:"
+    )
+    if not in_memory:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return create_engine(url, **options)
+
+
+def acquire_engine(uri: str):
+    """
+    Shared engine for a URI, created on first use. Returns (key, engine);
+    every acquire must be paired with release_engine(key).
+    """
+    key = engine_key(uri)
+    with _lock:
+        entry = _engines.get(key)
+        if entry is None:
+            entry = {
+                "engine": _create_engine(uri),
+                "label": make_url(uri).render_as_string(hide_password=True),
+                "refs": 0,
+                "created_at": time.time(),
+            }
+            _engines[key] = entry
+            logger.info(f"Created engine for {entry['label']}")
+        entry["refs"] += 1
+        return key, entry["engine"]
+
+
+def release_engine(key: str):
+    """Drop one reference; the last one disposes the engine's pool"""
+    with _lock:
+        entry = _engines.get(key)
+        if entry is None:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] > 0:
+            return
+        del _engines[key]
+
+    entry["engine"].dispose()
+    logger.info(f"Disposed engine for {entry['label']}")
+
+
+def dispose_all():
+    with _lock:
+        entries = list(_engines.values())
+        _engines.clear()
+    for entry in entries:
+        entry["engine"].dispose()
+
+
+def _pool_status(pool) -> dict:
+    status = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            try:
+                status[name] = method()
+            except Exception:
+                pass
+    return status
+
+
+def pool_stats() -> dict:
+    with _lock:
+        entries = list(_engines.items())
+    return {
+        "engines": [
+            {
+                "key": key[:12],
+                "url": entry["label"],
+                "sessions": entry["refs"],
+                "created_at": entry["created_at"],
+                **_pool_status(entry["engine"].pool),
+            }
+            for key, entry in entries
+        ],
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pre_ping": DB_POOL_PRE_PING,
+    }
@@ -0,0 +1,231 @@
+from langchain_core.language_models.llms import LLM
+from langchain_core.runnables import Runnable
+from langchain_core.outputs import GenerationChunk
+from pydantic import PrivateAttr
+from dotenv import load_dotenv
+from typing import Any, Dict, Iterator, List, Optional
+import threading
+import logging
+import random
+import json
+import time
+import os
+import re
+
+load_dotenv()
+
+logger = logging.getLogger("stub_model")
+
+# Deterministic backend for load tests and CI: no weights, Ollama or network.
+# STUB_FIXTURES is a JSON object of prompt -> response; a key matches the
+# whole prompt or, failing that, the question asked in it (case-insensitive)
+STUB_FIXTURES = os.getenv("STUB_FIXTURES", "")
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))  # before the first token
+STUB_TOKENS_PER_SECOND = float(os.getenv("STUB_TOKENS_PER_SECOND", "0"))  # 0 = instant
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_SEED = int(os.getenv("STUB_SEED", "0"))
+
+COUNT_WORDS = ("how many", "count", "number of")
+AGGREGATES = {
+    "average": "AVG",
+    "avg": "AVG",
+    "mean": "AVG",
+    "total": "SUM",
+    "sum": "SUM",
+    "maximum": "MAX",
+    "highest": "MAX",
+    "minimum": "MIN",
+    "lowest": "MIN",
+}
+CONSTRAINT_WORDS = {"PRIMARY", "FOREIGN", "UNIQUE", "CONSTRAINT", "CHECK"}
+
+
+def _last(pattern: str, prompt: str) -> str:
+    matches = re.findall(pattern, prompt)
+    return matches[-1].strip().strip('"') if matches else ""
+
+
+def _words(text: str) -> set:
+    words = set()
+    for word in re.findall(r"[a-z0-9_]+", text.lower()):
+        words.add(word)
+        if len(word) > 3 and word.endswith("s"):
+            words.add(word[:-1])
+    return words
+
+
+def parse_tables(table_info: str) -> Dict[str, List[str]]:
+    """Table -> columns from the CREATE TABLE statements in a prompt's schema"""
+    tables = {}
+    for name, body in re.findall(
+        r'(?is)CREATE TABLE\s+[`"\[]?(\w+)[`"\]]?\s*\((.*?)\n\)', table_info
+    ):
+        columns = []
+        for line in body.split("\n"):
+            m = re.match(r'\s*[`"\[]?(\w+)[`"\]]?\s+\w', line)
+            if m and m.group(1).upper() not in CONSTRAINT_WORDS:
+                columns.append(m.group(1))
+        tables[name] = columns
+    return tables
+
+
+def generate_select(question: str, tables: Dict[str, List[str]]) -> str:
+    """
+    Rule-based SELECT for a question: the most mentioned table, COUNT(*) for
+    "how many", an aggregate over a mentioned column, or the mentioned columns
+    """
+    if not tables:
+        return "SELECT 1;"
+
+    lowered = question.lower()
+    words = _words(question)
+
+    def mentions(table: str) -> int:
+        named = table.lower() in words
+        return named * 2 + sum(c.lower() in words for c in tables[table])
+
+    table = max(tables, key=lambda t: (mentions(t), -list(tables).index(t)))
+    columns = [c for c in tables[table] if c.lower() in words]
+
+    if any(w in lowered for w in COUNT_WORDS):
+        return f"SELECT COUNT(*) FROM {table};"
+    for word, function in AGGREGATES.items():
+        if word in words and columns:
+            return f"SELECT {function}({columns[0]}) FROM {table};"
+    if columns:
+        return f"SELECT {', '.join(columns)} FROM {table} LIMIT 10;"
+    return f"SELECT * FROM {table} LIMIT 10;"
+
+
+class StubLLM(LLM):
+    """
+    LLM that replays fixtures and otherwise answers the prompts from
+    prompts.py with a rule-based SELECT. Latency, token rate and error rate
+    can be injected; errors are drawn from a seeded generator.
+    """
+
+    fixtures: Dict[str, str] = {}
+    latency_ms: float = 0
+    tokens_per_second: float = 0
+    error_rate: float = 0
+    seed: int = 0
+
+    _rng: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+        self.fixtures = {k.strip().lower(): v for k, v in self.fixtures.items()}
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "tokens_per_second": self.tokens_per_second,
+            "error_rate": self.error_rate,
+        }
+
+    def respond(self, prompt: str) -> str:
+        """Response text for a prompt, without delays or injected errors"""
+        fixture = self.fixtures.get(prompt.strip().lower())
+        if fixture is not None:
+            return fixture
+
+        if "Original Question:" in prompt:  # question_rephrase
+            # Echoed: a fixture keyed on the question is its SQL, not a rephrasing
+            return _last(r"Original Question:(.*)", prompt)
+
+        tables = parse_tables(prompt)
+        if "Corrected SQL Query:" in prompt:  # correction_prompt
+            return generate_select(_last(r"\n\s*Query:(.*)", prompt), tables)
+
+        if prompt.rstrip().endswith("Rephrased Question:"):  # single call
+            question = _last(r"User Question:(.*)", prompt)
+            sql = self.fixtures.get(question.lower()) or generate_select(question, tables)
+            return f"{question}\nSQL Query: {sql}"
+
+        question = _last(r"Question:(.*)", prompt)
+        if not question:
+            return "SELECT 1;"  # warmup and unknown prompts
+        return self.fixtures.get(question.lower()) or generate_select(question, tables)
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        One invoke per prompt on a thread pool, like a remote API: delays
+        overlap and an injected error fails only its own prompt (LLM.batch
+        would run them in sequence and fail the whole batch)
+        """
+        return Runnable.batch(
+            self, inputs, config, return_exceptions=return_exceptions, **kwargs
+        )
+
+    def _maybe_fail(self):
+        if not self.error_rate:
+            return
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            raise RuntimeError("Injected stub model error")
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> str:
+        self._maybe_fail()
+        text = self.respond(prompt)
+        tokens = max(1, len(text) // 4)
+        time.sleep(self.latency_ms / 1000 + tokens * self._token_delay())
+        return text
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        self._maybe_fail()
+        text = self.respond(prompt)
+        time.sleep(self.latency_ms / 1000)
+        delay = self._token_delay()
+        # ~4 characters per token, like the estimates elsewhere
+        for start in range(0, len(text), 4):
+            if delay:
+                time.sleep(delay)
+            chunk = GenerationChunk(text=text[start : start + 4])
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def _load_fixtures(path: str) -> Dict[str, str]:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    logger.info(f"Loaded {len(fixtures)} stub fixtures from {path}")
+    return fixtures
+
+
+def load_stub_models():
+    fixtures = _load_fixtures(STUB_FIXTURES)
+    options = {
+        "fixtures": fixtures,
+        "latency_ms": STUB_LATENCY_MS,
+        "tokens_per_second": STUB_TOKENS_PER_SECOND,
+        "error_rate": STUB_ERROR_RATE,
+    }
+    llm1 = StubLLM(seed=STUB_SEED, **options)
+    llm2 = StubLLM(seed=STUB_SEED + 1, **options)
+    return llm1, llm2
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+
+logger = logging.getLogger("batching")
+
+
+class BatchScheduler:
+    """
+    Micro-batching scheduler for the model server.
+
+    Prompts submitted within window_ms of each other (up to max_size) are
+    dispatched together through chain.batch(), which runs them as parallel
+    requests for remote backends (OpenAI, Ollama) and as one generate() call
+    for LlamaCpp. max_inflight caps how many batches run at once; keep it at 1
+    for in-process models that are not thread-safe.
+    """
+
+    def __init__(self, chain, window_ms: float = 5, max_size: int = 16, max_inflight: int = 1):
+        self.chain = chain
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self.max_inflight = max_inflight
+        self.batches = 0
+        self.prompts = 0
+        self._queue = None
+        self._inflight = None
+        self._task = None
+
+    def start(self):
+        """Start collecting batches on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its completion"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def stream(self, prompt: str):
+        """
+        Yield chunks of chain.stream(prompt). A stream takes an in-flight slot
+        for its whole duration, so it never overlaps a batch beyond
+        max_inflight (with max_inflight=1 the model sees one caller at a time).
+        """
+        await self._inflight.acquire()
+        chunks = self.chain.stream(prompt)
+        done = object()
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, done)
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            chunks.close()
+            self._inflight.release()
+            self.prompts += 1
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Callers that gave up while queued don't need a generation
+            batch = [(prompt, future) for prompt, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            await self._inflight.acquire()
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            outputs = await asyncio.to_thread(
+                self.chain.batch,
+                prompts,
+                {"max_concurrency": len(prompts)},
+                return_exceptions=True,
+            )
+        except Exception as e:
+            logger.error(f"Batch of {len(prompts)} failed: {e}")
+            outputs = [e] * len(prompts)
+        finally:
+            self._inflight.release()
+
+        self.batches += 1
+        self.prompts += len(prompts)
+
+        for (_, future), output in zip(batch, outputs):
+            if future.done():
+                continue
+            if isinstance(output, Exception):
+                future.set_exception(output)
+            else:
+                future.set_result(output)
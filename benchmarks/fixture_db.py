@@ -0,0 +1,127 @@
+"""
+SQLite fixture with the frontend's default tables (courses, enrollments,
+students) for load tests. Data is generated from a fixed seed, so the same
+scale always produces the same database.
+
+    python benchmarks/fixture_db.py --students 10000 --output bench_output/bench.db
+"""
+from datetime import date, timedelta
+import argparse
+import sqlite3
+import random
+import os
+
+DEPARTMENTS = ["Mathematics", "Physics", "Chemistry", "Biology", "History", "Computer Science"]
+GRADES = ["A", "B", "C", "D", "F", None]
+
+SCHEMA = """
+CREATE TABLE students (
+    student_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    enrolled_on DATE NOT NULL
+);
+CREATE TABLE courses (
+    course_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    department TEXT NOT NULL,
+    credits INTEGER NOT NULL
+);
+CREATE TABLE enrollments (
+    enrollment_id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES students(student_id),
+    course_id INTEGER NOT NULL REFERENCES courses(course_id),
+    enrolled_at DATE NOT NULL,
+    grade TEXT
+);
+CREATE INDEX idx_enrollments_student ON enrollments(student_id);
+CREATE INDEX idx_enrollments_course ON enrollments(course_id);
+"""
+
+
+def build_fixture(
+    path: str,
+    students: int = 1000,
+    courses: int = None,
+    enrollments_per_student: int = 3,
+    seed: int = 42,
+) -> dict:
+    """(Re)create the fixture database at path and return its row counts"""
+    rng = random.Random(seed)
+    courses = courses or max(10, students // 50)
+    start = date(2020, 1, 1)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO students VALUES (?, ?, ?, ?)",
+            (
+                (
+                    i,
+                    f"Student {i}",
+                    f"student{i}@example.edu",
+                    (start + timedelta(days=rng.randrange(1500))).isoformat(),
+                )
+                for i in range(1, students + 1)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO courses VALUES (?, ?, ?, ?)",
+            (
+                (
+                    i,
+                    f"Course {i}",
+                    rng.choice(DEPARTMENTS),
+                    rng.choice([1, 2, 3, 4, 5]),
+                )
+                for i in range(1, courses + 1)
+            ),
+        )
+
+        def enrollments():
+            enrollment_id = 0
+            for student_id in range(1, students + 1):
+                count = rng.randint(0, 2 * enrollments_per_student)
+                for course_id in rng.sample(range(1, courses + 1), min(count, courses)):
+                    enrollment_id += 1
+                    yield (
+                        enrollment_id,
+                        student_id,
+                        course_id,
+                        (start + timedelta(days=rng.randrange(1500))).isoformat(),
+                        rng.choice(GRADES),
+                    )
+
+        conn.executemany("INSERT INTO enrollments VALUES (?, ?, ?, ?, ?)", enrollments())
+        conn.commit()
+
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("students", "courses", "enrollments")
+        }
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=None)
+    parser.add_argument("--enrollments-per-student", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_output/bench.db")
+    args = parser.parse_args()
+    print(
+        build_fixture(
+            args.output,
+            args.students,
+            args.courses,
+            args.enrollments_per_student,
+            args.seed,
+        )
+    )
@@ -0,0 +1,254 @@
+"""
+End-to-end load test of the API: /connect-database and /ask-question at
+rising concurrency against the SQLite fixture, with p50/p95/p99 latency and
+QPS per level written to a JSON report.
+
+With --start-stack the fixture is built and the stub model server and the
+API are started (and stopped) by the script:
+
+    python benchmarks/load_test.py --start-stack --students 10000 \
+        --concurrency 1 4 16 64 --stub-latency-ms 50
+
+With --model-type Stub the API starts a real model_server.py on the Stub
+backend instead (STUB_* settings from the --stub-* options), so the whole
+main -> model_server path, batching included, is under load.
+
+Otherwise point it at a running API whose model server for --model-type is
+up (a real one or benchmarks/stub_model_server.py) and an existing --db-path.
+"""
+from common import summarize, write_report
+from fixture_db import build_fixture
+from pipeline_modes import DEFAULT_QUESTIONS
+from urllib.parse import urlparse
+import subprocess
+import argparse
+import asyncio
+import httpx
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TABLES = ["courses", "enrollments", "students"]
+
+
+def wait_ready(url: str, timeout: float, process=None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_stack(args) -> list:
+    """Start the stub model server (unless the API runs the Stub backend), then the API"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT, os.path.join(ROOT, "LLMs"), os.path.join(ROOT, "DB_connection")]
+        + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    env.setdefault("TRACE_LOG_PATH", os.path.join(ROOT, "bench_output", "trace.jsonl"))
+    if args.api_workers > 1:
+        env.setdefault("SESSION_BACKEND", "sqlite")  # sessions shared by workers
+    env["STUB_LATENCY_MS"] = str(args.stub_latency_ms)
+    sys.path.insert(0, ROOT)
+    from subprocess_manager import backend_port
+
+    processes = []
+    try:
+        # The API spawns model_server.py itself for the Stub backend
+        if args.model_type != "Stub":
+            stub_port = backend_port(args.model_type)
+            stub = subprocess.Popen(
+                [
+                    sys.executable,
+                    os.path.join(BENCH_DIR, "stub_model_server.py"),
+                    "--model-type", args.model_type,
+                    "--port", str(stub_port),
+                    "--latency-ms", str(args.stub_latency_ms),
+                    "--jitter-ms", str(args.stub_jitter_ms),
+                ],
+                cwd=ROOT,
+                env=env,
+            )
+            processes.append(stub)
+            wait_ready(f"http://127.0.0.1:{stub_port}/healthz", 30, stub)
+
+        api_port = urlparse(args.base_url).port or 8000
+        api = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--host", "127.0.0.1",
+                "--port", str(api_port),
+                "--workers", str(args.api_workers),
+                "--log-level", "warning",
+            ],
+            cwd=ROOT,
+            env=env,
+        )
+        processes.append(api)
+        wait_ready(f"{args.base_url}/health", 60, api)
+    except BaseException:
+        stop_stack(processes)
+        raise
+    return processes
+
+
+def stop_stack(processes: list):
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def connect_sessions(client, args, count: int):
+    """Open count sessions concurrently; returns (session_ids, summary)"""
+    latencies, session_ids, errors = [], [], 0
+    payload = {"db_type": "sqlite", "db_name": args.db_path, "table_names": TABLES}
+
+    async def connect():
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            resp = await client.post("/connect-database", json=payload)
+            resp.raise_for_status()
+            session_ids.append(resp.json()["session_id"])
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connect() for _ in range(count)))
+    return session_ids, summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def ask_questions(client, args, session_ids: list, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    status_counts = {}
+
+    async def worker(index: int):
+        nonlocal errors
+        session_id = session_ids[index % len(session_ids)]
+        for i in range(args.requests):
+            question = DEFAULT_QUESTIONS[(index + i) % len(DEFAULT_QUESTIONS)]
+            start = time.perf_counter()
+            try:
+                resp = await client.post(
+                    "/ask-question",
+                    json={
+                        "session_id": session_id,
+                        "question": question,
+                        "used_model": {"model_type": args.model_type},
+                        "pipeline_mode": args.pipeline_mode,
+                        "use_cache": args.use_cache,
+                    },
+                )
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                status = resp.json()["status"]
+            except Exception:
+                errors += 1
+                status = "error"
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    summary = summarize(latencies, time.perf_counter() - start, errors)
+    summary["statuses"] = status_counts
+    return summary
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    report = {
+        "model_type": args.model_type,
+        "pipeline_mode": args.pipeline_mode,
+        "use_cache": args.use_cache,
+        "requests_per_worker": args.requests,
+        "levels": {},
+    }
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=limits) as client:
+        # One throwaway question so model warmup is not measured
+        session_ids, _ = await connect_sessions(client, args, 1)
+        if not session_ids:
+            raise RuntimeError("Could not connect to the fixture database")
+        await client.post(
+            "/ask-question",
+            json={
+                "session_id": session_ids[0],
+                "question": DEFAULT_QUESTIONS[0],
+                "used_model": {"model_type": args.model_type},
+            },
+        )
+        await client.delete(f"/session/{session_ids[0]}")
+
+        for concurrency in args.concurrency:
+            session_ids, connect = await connect_sessions(client, args, concurrency)
+            level = {"connect": connect}
+            if session_ids:
+                level["ask"] = await ask_questions(client, args, session_ids, concurrency)
+            await asyncio.gather(*(client.delete(f"/session/{s}") for s in session_ids))
+            report["levels"][str(concurrency)] = level
+            print(f"concurrency {concurrency}: {level}")
+
+    return report
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main(args):
+    args.db_path = os.path.abspath(args.db_path)
+    fixture = None
+    if args.start_stack or not os.path.exists(args.db_path):
+        fixture = build_fixture(args.db_path, args.students, seed=args.seed)
+
+    processes = start_stack(args) if args.start_stack else []
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        stop_stack(processes)
+
+    report["commit"] = git_commit()
+    report["fixture"] = fixture or {"path": args.db_path}
+    if args.start_stack:
+        report["stub_latency_ms"] = args.stub_latency_ms
+        report["api_workers"] = args.api_workers
+    write_report(args.output, report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--model-type", default="OpenAi")
+    parser.add_argument("--db-path", default="bench_output/bench.db")
+    parser.add_argument("--students", type=int, default=1000, help="fixture scale")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=20, help="questions per worker")
+    parser.add_argument("--pipeline-mode", default="two_step")
+    parser.add_argument("--use-cache", action="store_true")
+    parser.add_argument("--start-stack", action="store_true")
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--stub-latency-ms", type=float, default=50)
+    parser.add_argument("--stub-jitter-ms", type=float, default=0)
+    parser.add_argument("--output", default="bench_output/load_test.json")
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+"""
+Throughput of the model server's /generate endpoint at rising concurrency.
+
+Start a model server first (uvicorn model_server:app --port 8001 with
+MODEL_TYPE set), then:
+
+    python benchmarks/model_server_throughput.py --concurrency 1 8 32
+
+Reference run (MODEL_TYPE=Stub, STUB_LATENCY_MS=50, 8 requests per worker):
+
+    concurrency          1        8        32
+    BATCH_MAX_SIZE=16    14 qps   96 qps   211 qps (p95 186 ms)
+    BATCH_MAX_SIZE=1     16 qps   73 qps    75 qps (p95 427 ms)
+"""
+from common import summarize, write_report
+import argparse
+import asyncio
+import time
+import httpx
+
+
+async def run_level(url: str, prompt: str, concurrency: int, requests_per_worker: int):
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(timeout=None) as client:
+
+        async def worker():
+            nonlocal errors
+            for _ in range(requests_per_worker):
+                start = time.perf_counter()
+                try:
+                    resp = await client.post(url, json={"prompt": prompt})
+                    resp.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except Exception:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(latencies, elapsed, errors)
+
+
+async def main(args):
+    url = f"{args.base_url}/generate"
+    report = {"endpoint": url, "levels": {}}
+
+    for concurrency in args.concurrency:
+        report["levels"][str(concurrency)] = await run_level(
+            url, args.prompt, concurrency, args.requests
+        )
+
+    write_report(args.output, report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=8, help="requests per worker")
+    parser.add_argument("--prompt", default="Question: how many students are there?\nSQL Query:")
+    parser.add_argument("--output", default="bench_output/model_server_throughput.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+"""
+Stand-in for model_server.py that answers with canned SQL for the fixture
+database (see fixture_db.py) after a configurable delay, so load tests
+measure the API rather than a model. Prompts are answered by the Stub
+backend's StubLLM.respond, with CANNED_SQL as its fixtures.
+
+It reports itself as --model-type on that backend's fixed port, where the
+API adopts it as an already running model server instead of starting one:
+
+    python benchmarks/stub_model_server.py --model-type OpenAi --latency-ms 50
+"""
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List
+import argparse
+import asyncio
+import random
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "LLMs")]
+
+from pipeline_modes import DEFAULT_QUESTIONS
+from Stub import StubLLM
+
+app = FastAPI()
+
+MODEL_TYPE = os.getenv("STUB_MODEL_TYPE", "OpenAi")
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+JITTER_MS = float(os.getenv("STUB_JITTER_MS", "0"))
+
+# First matching keyword (lowercase) in a load test question picks its SQL
+CANNED_SQL = [
+    ("average credits", "SELECT AVG(credits) FROM courses;"),
+    (
+        "per course",
+        "SELECT c.title, COUNT(e.enrollment_id) AS enrollments FROM courses c "
+        "JOIN enrollments e ON e.course_id = c.course_id GROUP BY c.title;",
+    ),
+    (
+        "most students",
+        "SELECT c.title, COUNT(DISTINCT e.student_id) AS students FROM courses c "
+        "JOIN enrollments e ON e.course_id = c.course_id GROUP BY c.title "
+        "ORDER BY students DESC LIMIT 10;",
+    ),
+    (
+        "more than two courses",
+        "SELECT s.email FROM students s JOIN enrollments e ON e.student_id = s.student_id "
+        "GROUP BY s.student_id, s.email HAVING COUNT(*) > 2;",
+    ),
+    (
+        "recently",
+        "SELECT s.name, e.enrolled_at FROM enrollments e "
+        "JOIN students s ON s.student_id = e.student_id "
+        "ORDER BY e.enrolled_at DESC LIMIT 20;",
+    ),
+    ("how many students", "SELECT COUNT(*) FROM students;"),
+]
+DEFAULT_SQL = "SELECT * FROM students LIMIT 10;"
+
+
+class GenReq(BaseModel):
+    prompt: str
+    max_tokens: int = 1024
+    temperature: float = 0.0
+    stream: bool = False
+
+
+class GenBatchReq(BaseModel):
+    prompts: List[str]
+    max_tokens: int = 1024
+    temperature: float = 0.0
+
+
+def canned_sql(question: str) -> str:
+    question = question.lower()
+    for keyword, sql in CANNED_SQL:
+        if keyword in question:
+            return sql
+    return DEFAULT_SQL
+
+
+# Other questions get the Stub backend's rule-based SELECT
+STUB = StubLLM(fixtures={q: canned_sql(q) for q in DEFAULT_QUESTIONS})
+
+
+async def generate_text(prompt: str) -> str:
+    delay = LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)
+    await asyncio.sleep(max(0.0, delay) / 1000)
+    return STUB.respond(prompt)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ready", "ready": True, "model_type": MODEL_TYPE, "queue_depth": 0}
+
+
+@app.post("/generate")
+async def generate(req: GenReq):
+    text = await generate_text(req.prompt)
+    if req.stream:
+        return StreamingResponse(iter([text]), media_type="text/plain; charset=utf-8")
+    return {"text": text}
+
+
+@app.post("/generate_batch")
+async def generate_batch(req: GenBatchReq):
+    texts = await asyncio.gather(*(generate_text(p) for p in req.prompts))
+    return {"texts": list(texts)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    from subprocess_manager import backend_port
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-type", default=MODEL_TYPE)
+    parser.add_argument("--port", type=int, default=None, help="default: the backend's port")
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    args = parser.parse_args()
+
+    MODEL_TYPE, LATENCY_MS, JITTER_MS = args.model_type, args.latency_ms, args.jitter_ms
+    uvicorn.run(app, host="127.0.0.1", port=args.port or backend_port(args.model_type))
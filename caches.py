@@ -0,0 +1,245 @@
+from collections import OrderedDict
+from schema_linking import tokenize
+import threading
+import sys
+import time
+import os
+import re
+
+QUESTION_CACHE_SIZE = int(os.getenv("QUESTION_CACHE_SIZE", "1024"))
+QUESTION_CACHE_TTL_SECONDS = float(os.getenv("QUESTION_CACHE_TTL_SECONDS", "86400"))
+# Jaccard similarity for near-duplicate questions (0 disables fuzzy matching)
+QUESTION_CACHE_SIMILARITY = float(os.getenv("QUESTION_CACHE_SIMILARITY", "0"))
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "4096"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "60"))
+
+
+class LRUTTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a TTL. When
+    max_bytes is set, entries carry a size and the least recently used ones
+    are evicted to stay within the memory budget.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 0, max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._data = OrderedDict()  # key -> (expires_at, value, size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value, size = item
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                self.total_bytes -= size
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size: int = 0, ttl_seconds: float = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.time() + ttl if ttl > 0 else 0
+
+        if self.max_bytes and size > self.max_bytes:
+            return  # would evict everything else and still not fit
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+
+            self._data[key] = (expires_at, value, size)
+            self.total_bytes += size
+
+            while len(self._data) > self.max_entries or (
+                self.max_bytes and self.total_bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self.total_bytes -= item[2]
+        return default if item is None else item[1]
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Parts of a question kept in its cache key: quoted literals (verbatim),
+# comparison operators, signed numbers and words. Other punctuation goes.
+_QUESTION_TOKEN = re.compile(
+    r"""(?<!\w)'[^']*'(?!\w)|(?<!\w)"[^"]*"(?!\w)"""
+    r"|[<>!]=|<>|[<>=]|[-+]?\d+(?:\.\d+)?%?|\w+"
+)
+_WORD = re.compile(r"[a-z_]\w*")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Lowercase words and collapse whitespace, keeping what changes the answer:
+    "credits > 3" and "credits < 3" must not share a cache entry
+    """
+    tokens = []
+    for token in _QUESTION_TOKEN.findall(question):
+        tokens.append(token if token[0] in "'\"" else token.lower())
+    return " ".join(tokens)
+
+
+def _significant(normalized: str) -> list:
+    """Literals, operators and numbers of a normalized question"""
+    return [t for t in _QUESTION_TOKEN.findall(normalized) if not _WORD.fullmatch(t)]
+
+
+class QuestionSQLCache:
+    """
+    Maps (normalized question, schema fingerprint, db type, model type) to the
+    validated SQL and the rephrased question that produced it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUESTION_CACHE_SIZE,
+        ttl_seconds: float = QUESTION_CACHE_TTL_SECONDS,
+        similarity: float = QUESTION_CACHE_SIMILARITY,
+    ):
+        self._cache = LRUTTLCache(max_entries, ttl_seconds)
+        self.similarity = similarity
+
+    @staticmethod
+    def _key(question, fingerprint, db_type, model_type):
+        return (normalize_question(question), fingerprint, db_type, model_type)
+
+    def get(self, question: str, fingerprint: str, db_type: str, model_type: str):
+        """Return the cached entry dict or None"""
+        key = self._key(question, fingerprint, db_type, model_type)
+        entry = self._cache.get(key)
+        if entry is not None or self.similarity <= 0:
+            return entry
+
+        # Near-duplicate lookup, restricted to the same schema and model and
+        # to questions with the same literals, operators and numbers
+        tokens = set(tokenize(question))
+        if not tokens:
+            return None
+        significant = _significant(key[0])
+
+        best_key, best_score = None, 0.0
+        for other in self._cache.keys():
+            if other[1:] != key[1:] or _significant(other[0]) != significant:
+                continue
+            other_tokens = set(tokenize(other[0]))
+            union = tokens | other_tokens
+            score = len(tokens & other_tokens) / len(union) if union else 0.0
+            if score > best_score:
+                best_key, best_score = other, score
+
+        if best_key is not None and best_score >= self.similarity:
+            return self._cache.get(best_key)
+        return None
+
+    def set(
+        self,
+        question: str,
+        fingerprint: str,
+        db_type: str,
+        model_type: str,
+        sql: str,
+        rephrased: str = None,
+    ):
+        key = self._key(question, fingerprint, db_type, model_type)
+        self._cache.set(key, {"sql": sql, "rephrased": rephrased, "question": key[0]})
+
+    def invalidate(self, question: str, fingerprint: str, db_type: str, model_type: str):
+        self._cache.pop(self._key(question, fingerprint, db_type, model_type))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+def estimate_rows_size(columns, rows) -> int:
+    """Approximate in-memory size of a result set in bytes"""
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in columns)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+    return size
+
+
+class ResultCache:
+    """
+    Query results keyed on (connection URI, table set, canonical SQL), stored
+    as a column tuple plus a list of row tuples within a memory budget.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+    ):
+        self._cache = LRUTTLCache(max_entries, ttl_seconds, max_bytes=max_bytes)
+
+    def get(self, scope: tuple, canonical_sql: str):
+        """Return (columns, rows) or None"""
+        return self._cache.get((scope, canonical_sql))
+
+    def set(
+        self, scope: tuple, canonical_sql: str, columns, rows, ttl_seconds: float = None
+    ):
+        columns = tuple(columns)
+        rows = [tuple(row) for row in rows]
+        self._cache.set(
+            (scope, canonical_sql),
+            (columns, rows),
+            size=estimate_rows_size(columns, rows),
+            ttl_seconds=ttl_seconds,
+        )
+
+    def invalidate(self, scope: tuple) -> int:
+        """Drop every cached result for a connection/table scope"""
+        removed = 0
+        for key in self._cache.keys():
+            if key[0] == scope:
+                self._cache.pop(key)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        return self._cache.stats()
@@ -1,9 +1,37 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Literal
+from typing import Any, List, Dict, Optional, Literal
 
 
 class ModelType(BaseModel):
-    model_type: Literal["Local Text2SQL", "OpenAi", "Mistral"]
+    model_type: Literal["Local Text2SQL", "OpenAi", "Mistral", "Stub"]
+
+
+class SessionLimits(BaseModel):
+    max_rows: Optional[int] = Field(
+        default=None,
+        description="Rows returned with an answer; the rest are paged via "
+        "/result/{result_id}/page (server default RESULT_MAX_ROWS)",
+    )
+    max_estimated_rows: Optional[float] = Field(
+        default=None,
+        description="EXPLAIN row estimate above which the cost guard acts "
+        "(server default COST_GUARD_MAX_ROWS, 0 disables)",
+    )
+    max_estimated_cost: Optional[float] = Field(
+        default=None,
+        description="EXPLAIN cost estimate above which the cost guard acts, in "
+        "the database's planner units (server default COST_GUARD_MAX_COST)",
+    )
+    cost_action: Optional[Literal["reject", "warn", "limit"]] = Field(
+        default=None,
+        description="reject the query, only warn, or add a LIMIT of max_rows "
+        "(server default COST_GUARD_ACTION)",
+    )
+    statement_timeout_seconds: Optional[float] = Field(
+        default=None,
+        description="Per-query execution limit enforced by the database "
+        "(server default STATEMENT_TIMEOUT_SECONDS, 0 disables)",
+    )
 
 
 # Pydantic models for request/response
@@ -23,6 +51,9 @@ class DatabaseConfig(BaseModel):
     db_port: Optional[int] = Field(default=None, description="Database port (optional)")
     db_name: str = Field(..., description="Database name or file path for SQLite")
     table_names: List[str] = Field(..., description="List of table names to include")
+    limits: SessionLimits = Field(
+        default_factory=SessionLimits, description="Per-session execution limits"
+    )
 
 
 class ReConfigDB(BaseModel):
@@ -41,6 +72,9 @@ class ReConfigDB(BaseModel):
     db_port: Optional[int] = Field(default=None, description="Database port (optional)")
     db_name: str = Field(..., description="Database name or file path for SQLite")
     table_names: List[str] = Field(..., description="List of table names to include")
+    limits: SessionLimits = Field(
+        default_factory=SessionLimits, description="Per-session execution limits"
+    )
     session_id: str = Field(..., description="Session ID to reconnect")
 
 
@@ -48,6 +82,20 @@ class QuestionRequest(BaseModel):
     session_id: str
     question: str
     used_model: ModelType
+    pipeline_mode: Optional[Literal["two_step", "single_call", "adaptive"]] = Field(
+        default=None,
+        description="two_step (rephrase, then SQL), single_call (both in one "
+        "generation) or adaptive (skip rephrasing explicit questions). "
+        "Defaults to the server's PIPELINE_MODE.",
+    )
+    use_cache: bool = Field(
+        default=True, description="Look up and store validated SQL in the question cache"
+    )
+    result_format: Literal["columnar", "arrow", "text"] = Field(
+        default="columnar",
+        description="columnar (column arrays with types), arrow (base64 Arrow "
+        "IPC stream, needs pyarrow) or text (pretty-printed table in answer)",
+    )
 
 
 class DatabaseResponse(BaseModel):
@@ -66,3 +114,20 @@ class AnswerResponse(BaseModel):
     generated_sql: str
     status: str
     used_model: ModelType
+    schema_tokens_saved: Optional[int] = None
+    sql_cache: Optional[Literal["hit", "miss"]] = None
+    pipeline_mode: Optional[str] = None
+    row_count: Optional[int] = None
+    truncated: bool = False
+    result_id: Optional[str] = None
+    cost_warning: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+
+
+class ResultPage(BaseModel):
+    result_id: str
+    page: int
+    columns: List[str]
+    rows: List[List]
+    has_more: bool
+    complete: bool
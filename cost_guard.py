@@ -0,0 +1,308 @@
+from sqlalchemy import text
+from utils import SQLGLOT_DIALECTS
+from sqlglot import exp
+import logging
+import sqlglot
+import json
+import math
+import os
+import re
+
+logger = logging.getLogger("cost_guard")
+
+COST_GUARD_ENABLED = os.getenv("COST_GUARD_ENABLED", "true").lower() == "true"
+# Defaults for sessions that don't set their own thresholds (0 disables a check).
+# Cost is in the planner's own units, so it is only meaningful per dialect.
+COST_GUARD_MAX_ROWS = float(os.getenv("COST_GUARD_MAX_ROWS", "1000000"))
+COST_GUARD_MAX_COST = float(os.getenv("COST_GUARD_MAX_COST", "0"))
+# What to do with a query over a threshold: reject, warn or limit
+COST_GUARD_ACTION = os.getenv("COST_GUARD_ACTION", "limit")
+
+
+class CostGuardError(Exception):
+    """The query's estimated cost is over the session's thresholds"""
+
+
+def _explain_postgres(conn, query: str) -> dict:
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    top = plan[0]["Plan"]
+    return {"rows": float(top["Plan Rows"]), "cost": float(top["Total Cost"])}
+
+
+def _explain_mysql(conn, query: str) -> dict:
+    # Nested-loop estimate: rows examined per step, multiplied across the join
+    rows = 1.0
+    for step in conn.execute(text(f"EXPLAIN {query}")).mappings():
+        examined = float(step.get("rows") or 1)
+        filtered = float(step.get("filtered") or 100) / 100
+        rows *= max(1.0, examined * filtered)
+
+    cost = None
+    try:
+        plan = json.loads(conn.execute(text(f"EXPLAIN FORMAT=JSON {query}")).scalar())
+        cost = float(plan["query_block"]["cost_info"]["query_cost"])
+    except Exception:
+        pass
+    return {"rows": rows, "cost": cost}
+
+
+# Rows assumed per equality lookup on a non-unique index (SQLite's own guess
+# without ANALYZE statistics) and rows sampled to count GROUP BY keys
+SQLITE_ROWS_PER_LOOKUP = 10
+SQLITE_GROUP_SAMPLE_ROWS = 1000
+
+
+def _sqlite_table_rows(conn, table: str):
+    try:
+        size = conn.execute(text(f'SELECT MAX(rowid) FROM "{table}"')).scalar()
+    except Exception:
+        return None  # view or WITHOUT ROWID table
+    return max(1.0, float(size or 0))
+
+
+def _sqlite_step_rows(step: str, size: float) -> float:
+    """Rows one loop of the plan yields per row of the loops outside it"""
+    if step.startswith("SCAN"):
+        return size
+    m = re.search(r"\((.*)\)", step)
+    constraints = m.group(1) if m else ""
+    if not constraints or re.search(r"[<>]|\bIN\b", constraints):
+        return size  # a range can cover the whole table
+    if "PRIMARY KEY" in step:
+        return 1.0
+    return min(size, SQLITE_ROWS_PER_LOOKUP)
+
+
+def _sqlite_group_rows(conn, select, aliases: dict, rows: float) -> float:
+    """
+    Output rows of a grouped or DISTINCT top-level SELECT: 1 for a bare
+    aggregate, otherwise the distinct group keys counted on a sample of their
+    table (rows when the keys are not plain columns of one table)
+    """
+    if isinstance(select.args.get("distinct"), exp.Distinct):
+        keys = select.expressions
+    elif select.args.get("group"):
+        keys = select.args["group"].expressions
+    elif any(e.find(exp.AggFunc) and not e.find(exp.Window) for e in select.expressions):
+        return 1.0
+    else:
+        return rows
+
+    keys = [key.unalias() for key in keys]
+    tables = {
+        aliases.get(key.table.lower()) if key.table else None
+        for key in keys
+        if isinstance(key, exp.Column)
+    }
+    if len(select.args.get("joins") or []) == 0 and None in tables:
+        # "from_" in recent sqlglot releases, "from" before
+        source = select.args.get("from_") or select.args.get("from")
+        source = source.this if source is not None else None
+        if isinstance(source, exp.Table):
+            tables = (tables - {None}) | {source.name}
+    if len(tables) != 1 or None in tables or not all(isinstance(k, exp.Column) for k in keys):
+        return rows
+
+    table = tables.pop()
+    size = _sqlite_table_rows(conn, table)
+    if size is None:
+        return rows
+    columns = ", ".join(f'"{key.name}"' for key in keys)
+    sampled = int(min(size, SQLITE_GROUP_SAMPLE_ROWS))
+
+    def distinct_in(limit: int) -> int:
+        return conn.execute(text(
+            f"SELECT COUNT(*) FROM (SELECT DISTINCT {columns} FROM "
+            f'(SELECT {columns} FROM "{table}" LIMIT {limit}))'
+        )).scalar()
+
+    try:
+        half, distinct = distinct_in(sampled // 2), distinct_in(sampled)
+    except Exception:
+        return rows
+    if distinct - half <= distinct * 0.1:
+        groups = distinct  # the second half of the sample brought few new keys
+    else:
+        groups = distinct * size / sampled
+    return min(rows, max(1.0, float(groups)))
+
+
+def _sqlite_output_rows(conn, query, aliases: dict, rows: float) -> float:
+    """Cap a SELECT's loop estimate by its grouping, aggregates and LIMIT"""
+    if isinstance(query, exp.Select):
+        rows = _sqlite_group_rows(conn, query, aliases, rows)
+    limit = query.args.get("limit") if isinstance(query, exp.Query) else None
+    if limit is not None and limit.expression is not None and limit.expression.is_int:
+        rows = min(rows, float(limit.expression.name))
+    return rows
+
+
+def _explain_sqlite(conn, query: str) -> dict:
+    """
+    SQLite's planner reports no estimates, so the plan's nested loops are
+    sized by hand: full scans and range searches by the table's largest
+    rowid, primary-key lookups as one row, other index lookups as a few.
+    Grouping, bare aggregates and LIMIT then cap the output of the
+    top-level SELECT and of materialized subqueries.
+    """
+    parsed = None
+    aliases = {}
+    subqueries = {}  # FROM subquery/CTE alias -> its SELECT
+    try:
+        parsed = sqlglot.parse_one(query, read="sqlite")
+        for table in parsed.find_all(exp.Table):
+            aliases[table.alias_or_name.lower()] = table.name
+        for node in parsed.find_all(exp.Subquery, exp.CTE):
+            if node.alias:
+                subqueries[node.alias.lower()] = node.this
+    except Exception:
+        pass
+
+    children = {}
+    for step in conn.execute(text(f"EXPLAIN QUERY PLAN {query}")).mappings():
+        children.setdefault(step["parent"], []).append((step["id"], step["detail"]))
+    materialized = {}  # subquery/CTE name -> its estimated rows
+
+    def loop_rows(parent) -> float:
+        rows = 1.0
+        for step_id, detail in children.get(parent, []):
+            m = re.match(r"(?:MATERIALIZE|CO-ROUTINE) (\w+)", detail)
+            if m:
+                name = m.group(1).lower()
+                rows_inside = loop_rows(step_id)
+                if name in subqueries:
+                    rows_inside = _sqlite_output_rows(
+                        conn, subqueries[name], aliases, rows_inside
+                    )
+                materialized[name] = rows_inside
+                continue
+            if detail.startswith("COMPOUND"):
+                rows *= sum(loop_rows(part) for part, _ in children.get(step_id, []))
+                continue
+            m = re.match(r"(?:SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?", detail)
+            if not m:
+                continue  # IN/scalar subqueries, temp b-trees: no extra rows
+            name = (m.group(2) or m.group(1)).lower()
+            size = materialized.get(name)
+            if size is None:
+                size = _sqlite_table_rows(conn, aliases.get(name, m.group(1)))
+            if size is not None:
+                rows *= _sqlite_step_rows(detail, size)
+        return rows
+
+    rows = _sqlite_output_rows(conn, parsed, aliases, loop_rows(0))
+    return {"rows": rows, "cost": None}
+
+
+EXPLAINERS = {
+    "postgresql": _explain_postgres,
+    "mysql": _explain_mysql,
+    "sqlite": _explain_sqlite,
+}
+
+
+def explain(conn, query: str, db_type: str) -> dict:
+    """
+    Planner estimate for a query: {"rows", "cost"} (either may be None), or
+    None for dialects without a supported EXPLAIN
+    """
+    explainer = EXPLAINERS.get(db_type.lower())
+    if explainer is None:
+        return None
+    return explainer(conn, query.strip().rstrip(";"))
+
+
+def add_limit(query: str, limit: int, db_type: str) -> str:
+    """Cap a SELECT at limit rows in the dialect's syntax (LIMIT/TOP/FETCH FIRST)"""
+    dialect = SQLGLOT_DIALECTS.get(db_type.lower())
+    parsed = sqlglot.parse_one(query, read=dialect)
+    if not isinstance(parsed, exp.Query):
+        raise ValueError("Only SELECT queries can be limited")
+
+    current = parsed.args.get("limit") or parsed.args.get("fetch")
+    if current is not None:
+        value = current.args.get("expression") or current.args.get("count")
+        if value is not None and value.is_int and int(value.name) <= limit:
+            return query  # already limited tightly enough
+    return parsed.limit(limit).sql(dialect=dialect)
+
+
+def _thresholds(limits) -> tuple:
+    max_rows = getattr(limits, "max_estimated_rows", None)
+    max_cost = getattr(limits, "max_estimated_cost", None)
+    action = getattr(limits, "cost_action", None)
+    return (
+        COST_GUARD_MAX_ROWS if max_rows is None else max_rows,
+        COST_GUARD_MAX_COST if max_cost is None else max_cost,
+        action or COST_GUARD_ACTION,
+    )
+
+
+def guard_query(db, query: str, db_type: str, limits=None, limit_rows: int = None):
+    """
+    Run the dialect's EXPLAIN and compare the estimate with the session
+    thresholds (blocking, call through run_db). Returns (query, notice):
+    the query unchanged or rewritten with a row limit, and a notice dict
+    when a threshold was crossed. Raises CostGuardError when the action
+    is "reject".
+    """
+    if not COST_GUARD_ENABLED:
+        return query, None
+
+    max_rows, max_cost, action = _thresholds(limits)
+    if not max_rows and not max_cost:
+        return query, None
+
+    conn = db._engine.connect()
+    try:
+        estimate = explain(conn, query, db_type)
+    except Exception as e:
+        # The real execution reports a broken query better than EXPLAIN does
+        logger.debug(f"EXPLAIN failed, skipping cost guard: {e}")
+        return query, None
+    finally:
+        conn.close()
+
+    if estimate is None:
+        return query, None
+
+    rows, cost = estimate["rows"], estimate["cost"]
+    over = []
+    if max_rows and rows is not None and rows > max_rows:
+        over.append(f"~{rows:,.0f} rows (limit {max_rows:,.0f})")
+    if max_cost and cost is not None and cost > max_cost:
+        over.append(f"cost {cost:,.0f} (limit {max_cost:,.0f})")
+    if not over:
+        return query, None
+
+    message = f"Estimated {' and '.join(over)}"
+    notice = {
+        "action": action,
+        "estimated_rows": None if rows is None or math.isinf(rows) else rows,
+        "estimated_cost": cost,
+        "message": message,
+    }
+
+    if action == "reject":
+        raise CostGuardError(
+            f"Query rejected by the cost guard: {message}. "
+            "Add selective filters, join conditions or a LIMIT."
+        )
+
+    if action == "limit" and limit_rows:
+        # One row past the cap so the caller still sees the result as
+        # truncated and keeps the cursor for paging
+        try:
+            limited = add_limit(query, limit_rows + 1, db_type)
+        except Exception as e:
+            logger.warning(f"Could not add a LIMIT to an expensive query: {e}")
+        else:
+            if limited != query:
+                notice["message"] = f"{message}; limited to {limit_rows} rows"
+                notice["query"] = limited
+                query = limited
+
+    logger.warning(f"Cost guard: {notice['message']}")
+    return query, notice
@@ -0,0 +1,160 @@
+from sqlalchemy import text
+import threading
+import logging
+import time
+import os
+import re
+
+logger = logging.getLogger("db_timeouts")
+
+# Default per-statement limit for generated queries (0 = no limit); sessions
+# may set their own in SessionLimits.statement_timeout_seconds
+STATEMENT_TIMEOUT_SECONDS = float(os.getenv("STATEMENT_TIMEOUT_SECONDS", "30"))
+# SQLite checks the progress handler every this many VM instructions
+SQLITE_PROGRESS_STEPS = int(os.getenv("SQLITE_PROGRESS_STEPS", "10000"))
+
+
+class StatementTimeoutError(Exception):
+    """A query ran past its statement timeout and was stopped by the database"""
+
+
+class QueryCancelledError(Exception):
+    """A query was cancelled because its client went away"""
+
+
+def _dbapi(conn):
+    """The driver connection under a SQLAlchemy connection"""
+    raw = conn.connection
+    return getattr(raw, "driver_connection", None) or raw.dbapi_connection
+
+
+class QueryHandle:
+    """
+    Tracks the connection a query runs on so it can be cancelled from another
+    thread (client disconnect) and stopped when its statement timeout passes.
+    """
+
+    def __init__(self, db_type: str = "", timeout_seconds: float = None):
+        self.db_type = db_type.lower()
+        self.timeout = (
+            STATEMENT_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
+        )
+        self.deadline = None
+        self.cancelled = False
+        self.conn = None
+        self.cursor = None  # OpenCursor handed back to the caller, if any
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def timed_out(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def start(self, conn, query: str) -> str:
+        """
+        Apply the dialect's statement timeout to conn and return the query to
+        run (MySQL takes the limit as an optimizer hint in the query itself)
+        """
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelledError("Query cancelled before it started")
+            self.conn = conn
+
+        if not self.timeout:
+            return query
+
+        self.deadline = time.monotonic() + self.timeout
+        ms = int(self.timeout * 1000)
+
+        if self.db_type == "postgresql":
+            # LOCAL: reset when the connection's transaction ends
+            conn.execute(text(f"SET LOCAL statement_timeout = {ms}"))
+        elif self.db_type == "mysql" and re.match(r"(?is)\s*SELECT\b", query):
+            hint = f"SELECT /*+ MAX_EXECUTION_TIME({ms}) */"
+            query = re.sub(r"(?is)^\s*SELECT\b", hint, query, count=1)
+        elif self.db_type == "sqlite":
+            _dbapi(conn).set_progress_handler(
+                self._sqlite_progress, SQLITE_PROGRESS_STEPS
+            )
+        else:
+            # No native setting (or a MySQL WITH query, which takes no hint
+            # up front): cancel through the driver when time is up
+            self._timer = threading.Timer(
+                self.timeout, self.cancel, kwargs={"timeout": True}
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+        return query
+
+    def _sqlite_progress(self) -> int:
+        return 1 if self.cancelled or self.timed_out() else 0
+
+    def finish(self, cursor=None):
+        """
+        The first page is fetched (or the query failed). Further paging of
+        cursor is not time limited, but a cancel still closes it.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+        with self._lock:
+            conn, self.conn, self.cursor = self.conn, None, cursor
+        if self.db_type == "sqlite" and conn is not None and not conn.closed:
+            try:
+                _dbapi(conn).set_progress_handler(None, 0)
+            except Exception:
+                pass
+        if cursor is not None and self.cancelled:
+            cursor.close()
+            raise QueryCancelledError("Query cancelled: the client disconnected")
+
+    def cancel(self, timeout: bool = False):
+        """Stop the running query (safe to call from any thread)"""
+        with self._lock:
+            if not timeout:
+                self.cancelled = True
+            conn, cursor = self.conn, self.cursor
+
+        if cursor is not None:
+            # Already fetched: nobody will read the rest
+            try:
+                cursor.close()
+            except Exception:
+                pass
+            return
+
+        if conn is None:
+            return  # not started yet, start() will refuse
+
+        try:
+            dbapi = _dbapi(conn)
+            if self.db_type == "sqlite":
+                dbapi.interrupt()
+            elif self.db_type == "mysql":
+                threading.Thread(
+                    target=self._kill_mysql_query,
+                    args=(conn.engine, dbapi.thread_id()),
+                    daemon=True,
+                ).start()
+            elif hasattr(dbapi, "cancel"):
+                dbapi.cancel()  # psycopg, cx_Oracle / oracledb
+        except Exception as e:
+            logger.warning(f"Could not cancel query: {e}")
+
+    @staticmethod
+    def _kill_mysql_query(engine, thread_id: int):
+        try:
+            with engine.connect() as killer:
+                killer.execute(text(f"KILL QUERY {int(thread_id)}"))
+        except Exception as e:
+            logger.warning(f"Could not kill MySQL query {thread_id}: {e}")
+
+    def translate(self, error: Exception) -> Exception:
+        """Turn a driver error caused by the timeout or a cancel into ours"""
+        if self.cancelled:
+            return QueryCancelledError("Query cancelled: the client disconnected")
+        if self.timed_out():
+            return StatementTimeoutError(
+                f"Query exceeded the statement timeout of {self.timeout:g} seconds. "
+                "Add filters or aggregate to make it cheaper."
+            )
+        return error
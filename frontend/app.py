@@ -362,23 +362,37 @@ else:
                 if message.get("result"):
                     result = message["result"]
 
-                    # Try to parse as JSON dataframe
-                    try:
-                        result_dict = json.loads(result)
-                        if (
-                            isinstance(result_dict, dict)
-                            and result_dict.get("type") == "dataframe"
-                        ):
-                            df = pd.DataFrame(result_dict["data"])
-                            st.dataframe(df, use_container_width=True)
-                        else:
-                            st.markdown(result, unsafe_allow_html=True)
-                    except (json.JSONDecodeError, ValueError):
-                        # Check if it's HTML
-                        if "<table" in result.lower():
-                            st.markdown(result, unsafe_allow_html=True)
-                        else:
-                            st.code(result, language="text")
+                    # Columnar payload from the API: render without re-parsing
+                    if isinstance(result, dict) and result.get("type") == "dataframe":
+                        df = pd.DataFrame(result["data"], columns=result["columns"])
+                        st.dataframe(df, use_container_width=True)
+                    else:
+                        # Try to parse as JSON dataframe
+                        try:
+                            result_dict = json.loads(result)
+                            if (
+                                isinstance(result_dict, dict)
+                                and result_dict.get("type") == "dataframe"
+                            ):
+                                df = pd.DataFrame(result_dict["data"])
+                                st.dataframe(df, use_container_width=True)
+                            else:
+                                st.markdown(result, unsafe_allow_html=True)
+                        except (json.JSONDecodeError, ValueError):
+                            # Check if it's HTML
+                            if "<table" in result.lower():
+                                st.markdown(result, unsafe_allow_html=True)
+                            else:
+                                st.code(result, language="text")
+
+                if message.get("cost_warning"):
+                    st.warning(f"⚠️ {message['cost_warning']}")
+
+                if message.get("truncated"):
+                    st.caption(
+                        f"Showing the first {message.get('row_count')} rows; "
+                        "the full result is larger."
+                    )
 
                 # Show status
                 if message.get("status"):
@@ -433,37 +447,69 @@ else:
         # Add user message to history
         st.session_state.chat_history.append({"role": "user", "content": user_question})
 
-        # Call API
+        # Call API (streamed: each pipeline stage is shown as it completes)
         with st.spinner("🤔 Thinking..."):
             try:
                 response = requests.post(
-                    f"{API_BASE_URL}/ask-question",
+                    f"{API_BASE_URL}/ask-question/stream",
                     json={
                         "session_id": st.session_state.session_id,
                         "question": user_question,
                         "used_model": {"model_type": model_type},
                     },
+                    stream=True,
                     timeout=1000,
                 )
 
                 if response.status_code == 200:
-                    data = response.json()
-
-                    # Add assistant response to history
-                    st.session_state.chat_history.append(
-                        {
-                            "role": "assistant",
-                            "sql": data.get("generated_sql"),
-                            "rephrased": data.get("question_rephrased"),
-                            "result": data.get("clean_text", data.get("answer")),
-                            "status": data.get("status"),
-                            "model_type": data.get("used_model", {}).get(
-                                "model_type", "Unknown"
-                            ),
-                        }
-                    )
+                    progress = st.empty()
+                    data, error_detail = None, None
+                    event = None
+
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):
+                            event = line[len("event:") :].strip()
+                            continue
+                        if not line.startswith("data:"):
+                            continue
+
+                        payload = json.loads(line[len("data:") :])
+                        if event == "rephrased":
+                            progress.info(f"💭 {payload['question']}")
+                        elif event == "sql":
+                            progress.code(payload["query"], language="sql")
+                        elif event == "attempt":
+                            progress.warning(f"🔧 Fixing query: {payload['error']}")
+                        elif event == "cost":
+                            progress.warning(f"⚠️ {payload['message']}")
+                        elif event == "answer":
+                            data = payload
+                        elif event == "error":
+                            error_detail = payload.get("detail", "Unknown error")
+
+                    progress.empty()
+
+                    if data is not None:
+                        # Add assistant response to history
+                        st.session_state.chat_history.append(
+                            {
+                                "role": "assistant",
+                                "sql": data.get("generated_sql"),
+                                "rephrased": data.get("question_rephrased"),
+                                "result": data.get("result") or data.get("answer"),
+                                "status": data.get("status"),
+                                "truncated": data.get("truncated", False),
+                                "row_count": data.get("row_count"),
+                                "cost_warning": data.get("cost_warning"),
+                                "model_type": data.get("used_model", {}).get(
+                                    "model_type", "Unknown"
+                                ),
+                            }
+                        )
 
-                    st.rerun()
+                        st.rerun()
+                    else:
+                        st.error(f"❌ Error: {error_detail or 'Unknown error'}")
                 else:
                     error_detail = response.json().get("detail", "Unknown error")
                     st.error(f"❌ Error: {error_detail}")
@@ -10,19 +10,65 @@ from config import (
     ReConfigDB,
     QuestionRequest,
     AnswerResponse,
+    ResultPage,
+    SessionLimits,
 )
 from prompts import (
     correction_prompt,
     get_enhanced_sql_prompt_template,
+    get_rephrase_and_sql_prompt_template,
     question_rephrase,
 )
-from utils import extract_sql, normalize_sql_quotes, to_text, call_model, is_model_server_running
+from utils import (
+    extract_sql,
+    extract_rephrase_and_sql,
+    normalize_sql_quotes,
+    to_text,
+    call_model,
+    stream_model,
+    close_model_clients,
+    use_model_port,
+    cancel_on_disconnect,
+    ClientDisconnected,
+)
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-from subprocess_manager import start_model_server, stop_model_server
+from subprocess_manager import (
+    start_model_server,
+    stop_model_server,
+    is_model_server_alive,
+    touch_model_server,
+    model_server_status,
+)
 from langchain_core.output_parsers import StrOutputParser
-from query_execution import validate_and_execute_query
-from fastapi import FastAPI, HTTPException, Depends
+from query_execution import (
+    validate_and_execute_query,
+    run_db,
+    format_rows,
+    result_cache,
+    result_scope,
+    result_store,
+    RESULT_MAX_ROWS,
+)
+from schema_snapshot import build_schema_snapshot, get_schema, refresh_schema
+from schema_linking import link_schema, is_explicit_question, estimate_tokens
+from caches import QuestionSQLCache
+from session_store import SessionStore
+from result_store import RESULT_PAGE_WAIT_SECONDS
+from trace_log import TraceLog, start_trace, trace_set
+from result_format import to_columnar, to_arrow
+from sql_repair import repair_stats
+from metrics import (
+    set_labels,
+    stage,
+    render_metrics,
+    REQUESTS,
+    PROMPT_TOKENS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+)
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
 from localmodel import load_local_models
 from typing import List, Dict, Optional
 from Mistral import load_mistral_models
@@ -30,11 +76,14 @@ from pydantic import BaseModel, Field
 from OpenAI import load_OpenAI_model
 from urllib.parse import quote_plus
 from db_connect import db_connect
+from engine_registry import release_engine, dispose_all, pool_stats
 from operator import itemgetter
 from dotenv import load_dotenv
 import requests
 import logging
 import asyncio
+import json
+import time
 import uuid
 import os
 
@@ -56,33 +105,173 @@ app.add_middleware(
 )
 
 # Global variables for models (loaded once at startup)
-CURRENT_MODEL = {"model_type": None}
 llm1 = None  # Text2SQL model
 llm2 = None  # Answer generation model
 
 # Store active database connections and memories per session
-active_sessions: Dict[str, Dict] = {}
+# Idle sessions are reaped and the least recently used evicted past the
+# limits; eviction releases their engine reference and paged results
+active_sessions = SessionStore(
+    on_evict=lambda session_id, data: release_session(session_id, data)
+)
+# Pages of truncated results are then served by whichever worker is asked
+if active_sessions.backend.shared:
+    result_store.share(active_sessions.backend)
+
+# Validated SQL for previously answered questions
+question_cache = QuestionSQLCache()
+
+# One JSONL record per answered question, written in the background
+trace_log = TraceLog()
+
+# uvicorn worker processes when started with `python main.py`; sessions are
+# shared through SESSION_BACKEND and model servers through their fixed ports
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+# two_step | single_call | adaptive, overridable per request
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_step")
+
+# Backend launched and warmed at startup; requests gate on it via /ready
+DEFAULT_MODEL_TYPE = os.getenv("DEFAULT_MODEL_TYPE", "")
+WARMUP_PROMPT = "SELECT 1;"
+
+# session_id -> task rebuilding a stored session in this worker
+_session_loads: Dict[str, asyncio.Task] = {}
+
+# model_type -> task that starts and warms the backend and resolves to its
+# port; concurrent requests await the same task instead of each starting one
+_model_warmups: Dict[str, asyncio.Task] = {}
+
+
+@app.on_event("startup")
+async def warm_default_model():
+    """Start loading the configured backend without delaying API startup"""
+    if not DEFAULT_MODEL_TYPE:
+        return
+
+    async def warm():
+        try:
+            await warm_model(DEFAULT_MODEL_TYPE, os.getenv("MODEL_PATH"))
+            logger.info(f"Model {DEFAULT_MODEL_TYPE} loaded and warmed up")
+        except Exception as e:
+            logger.error(f"Warmup of {DEFAULT_MODEL_TYPE} failed: {e}")
+
+    asyncio.create_task(warm())
+
+
+@app.on_event("startup")
+async def start_session_reaper():
+    active_sessions.start_reaper()
+    trace_log.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    active_sessions.stop_reaper()
+    await trace_log.stop()
+    await close_model_clients()
+    await asyncio.to_thread(stop_model_server)
+    result_store.close()
+    dispose_all()
+
+
+def release_session(session_id: str, session_data: dict):
+    """Drop a session's paged results and its reference to the shared engine"""
+    result_store.drop_session(session_id)
+    if "engine_key" in session_data:
+        release_engine(session_data["engine_key"])
+
+
+async def _rebuild_session(session_id: str, record: dict) -> dict:
+    config = DatabaseConfig(**record["config"])
+    db, engine_key = await run_db(db_connect, config)
+    try:
+        scope = await run_db(result_scope, db)
+    except BaseException:
+        release_engine(engine_key)
+        raise
+
+    session_data = {
+        "db": db,
+        "engine_key": engine_key,
+        "config": config,
+        "table_names": record["table_names"],
+        "db_type": record["db_type"],
+        "schema": record["schema"],
+        "result_scope": scope,
+        "limits": SessionLimits(**record["limits"]),
+    }
+    await asyncio.to_thread(
+        active_sessions.attach, session_id, session_data, record.get("version")
+    )
+    logger.info(f"Session {session_id} rebuilt from the session store")
+    return session_data
+
+
+async def get_session(session_id: str) -> Optional[dict]:
+    """
+    A session's live data. Sessions created by another worker (or unloaded
+    from this one) are rebuilt from their stored record: the engine is
+    recreated, the schema snapshot is reused. A live session deleted or
+    reconnected by another worker is dropped and reloaded from the current
+    record. Returns None if unknown.
+    """
+    session_data = active_sessions.get(session_id)
+    if session_data is not None:
+        if not active_sessions.backend.shared or await asyncio.to_thread(
+            active_sessions.is_current, session_id
+        ):
+            return session_data
+
+    task = _session_loads.get(session_id)
+    if task is None:
+        record = await asyncio.to_thread(active_sessions.load, session_id)
+        if record is None:
+            return None
+        task = _session_loads.get(session_id)
+        if task is None:
+            task = asyncio.create_task(_rebuild_session(session_id, record))
+            _session_loads[session_id] = task
+            task.add_done_callback(lambda _: _session_loads.pop(session_id, None))
+    return await asyncio.shield(task)
 
 
 @app.post("/connect-database", response_model=DatabaseResponse)
 async def connect_database(config: DatabaseConfig):
     """Connect to database and initialize session"""
     try:
-        session_id = f"{config.db_type}{config.db_host}{config.db_name}{len(active_sessions)}{uuid.uuid4()}"
-
-        db = db_connect(config)
-
-        # Test connection
-        table_names = db.get_usable_table_names()
-        if not table_names:
-            raise HTTPException(status_code=400, detail="No accessible tables found")
+        session_count = await asyncio.to_thread(active_sessions.count)
+        session_id = f"{config.db_type}{config.db_host}{config.db_name}{session_count}{uuid.uuid4()}"
+
+        db, engine_key = await run_db(db_connect, config)
+
+        try:
+            # Test connection
+            table_names = await run_db(db.get_usable_table_names)
+            if not table_names:
+                raise HTTPException(
+                    status_code=400, detail="No accessible tables found"
+                )
+
+            # Snapshot the schema once; questions read it instead of db.table_info
+            schema = await run_db(build_schema_snapshot, db)
+            scope = await run_db(result_scope, db)
+        except BaseException:
+            release_engine(engine_key)
+            raise
 
         # Store session data
-        active_sessions[session_id] = {
+        session_data = {
             "db": db,
+            "engine_key": engine_key,
+            "config": config,
             "table_names": table_names,
             "db_type": config.db_type,
+            "schema": schema,
+            "result_scope": scope,
+            "limits": config.limits,
         }
+        await asyncio.to_thread(active_sessions.add, session_id, session_data)
 
         logger.info(f"Database connected for session {session_id}")
         logger.info(f"Available tables: {table_names}")
@@ -91,7 +280,7 @@ async def connect_database(config: DatabaseConfig):
             session_id=session_id,
             status="success",
             message=f"Connected successfully. Available tables: {', '.join(table_names)}",
-            table_info=db.table_info,
+            table_info=schema["table_info"],
         )
 
     except Exception as e:
@@ -107,19 +296,40 @@ async def reconnect_database(config: ReConfigDB):
     try:
         session_id = config.session_id
 
-        db = db_connect(config)
+        db, engine_key = await run_db(db_connect, config)
 
-        # Test connection
-        table_names = db.get_usable_table_names()
-        if not table_names:
-            raise HTTPException(status_code=400, detail="No accessible tables found")
+        try:
+            # Test connection
+            table_names = await run_db(db.get_usable_table_names)
+            if not table_names:
+                raise HTTPException(
+                    status_code=400, detail="No accessible tables found"
+                )
+
+            # Snapshot the schema once; questions read it instead of db.table_info
+            schema = await run_db(build_schema_snapshot, db)
+            scope = await run_db(result_scope, db)
+        except BaseException:
+            release_engine(engine_key)
+            raise
+
+        # The session's previous engine reference is given back
+        previous = active_sessions.get(session_id)
+        if previous is not None:
+            release_session(session_id, previous)
 
         # Store session data
-        active_sessions[session_id] = {
+        session_data = {
             "db": db,
+            "engine_key": engine_key,
+            "config": config,
             "table_names": table_names,
             "db_type": config.db_type,
+            "schema": schema,
+            "result_scope": scope,
+            "limits": config.limits,
         }
+        await asyncio.to_thread(active_sessions.add, session_id, session_data)
 
         logger.info(f"Database connected for session {session_id}")
         logger.info(f"Available tables: {table_names}")
@@ -128,7 +338,7 @@ async def reconnect_database(config: ReConfigDB):
             session_id=session_id,
             status="reconnected successfully",
             message=f"Connected successfully. Available tables: {', '.join(table_names)}",
-            table_info=db.table_info,
+            table_info=schema["table_info"],
         )
 
     except Exception as e:
@@ -138,72 +348,265 @@ async def reconnect_database(config: ReConfigDB):
         )
 
 
-def ensure_model_runtime(model_type: str, model_path: str = ""):
+async def _start_and_warm(model_type: str, model_path: str = "") -> int:
+    port = await asyncio.to_thread(
+        start_model_server, model_type=model_type, model_path=model_path
+    )
+    if not is_model_server_alive(model_type):
+        raise RuntimeError(f"Model server for {model_type} failed to start")
+
+    # One tiny generation so weights and caches are hot before real traffic
+    use_model_port(port)
+    try:
+        await call_model(WARMUP_PROMPT, max_tokens=1)
+    except Exception as e:
+        logger.warning(f"Warmup generation for {model_type} failed: {e}")
+
+    return port
+
+
+async def warm_model(model_type: str, model_path: str = "") -> int:
+    """Start and warm a backend once; concurrent callers share the same task"""
+    task = _model_warmups.get(model_type)
+    if task is None or task.done():
+        task = asyncio.create_task(_start_and_warm(model_type, model_path))
+        _model_warmups[model_type] = task
+    return await asyncio.shield(task)
+
+
+async def ensure_model_runtime(model_type: str, model_path: str = ""):
     """
-    Start/stop subprocesses only if model actually changed
+    Make sure a warm model server for model_type is running and route this
+    request's model calls to it. Backends for other model types stay up.
     """
-    global CURRENT_MODEL
-
-    if CURRENT_MODEL["model_type"] == model_type and is_model_server_running():
-        return
+    # Cached liveness (Popen.poll + background heartbeat): no HTTP on the hot path
+    if is_model_server_alive(model_type):
+        port = touch_model_server(model_type)
+    else:
+        try:
+            port = await warm_model(model_type, model_path)
+        except Exception as e:
+            raise HTTPException(
+                status_code=503, detail=f"Model {model_type} is not available: {e}"
+            )
 
-    start_model_server(model_type=model_type, model_path=model_path)
+    use_model_port(port)
+
+
+async def generate(prompt: str, emit=None, stage_name: str = "") -> str:
+    """Call the model, streaming tokens to emit when a stream is attached"""
+    PROMPT_TOKENS.set(estimate_tokens(prompt), prompt=stage_name)
+    with stage(stage_name):
+        if emit is None:
+            return to_text(await call_model(prompt))
+
+        chunks = []
+        async for chunk in stream_model(prompt):
+            chunks.append(chunk)
+            await emit("token", {"stage": stage_name, "text": chunk})
+        return "".join(chunks)
+
+
+async def run_question_pipeline(request: QuestionRequest, emit=None) -> AnswerResponse:
+    """Answer a question, recording its latency, outcome and trace record"""
+    set_labels(model_type=request.used_model.model_type)
+    trace = start_trace(
+        request_id=uuid.uuid4().hex,
+        session_id=request.session_id,
+        question=request.question,
+        model_type=request.used_model.model_type,
+    )
+    status = "error"
+    try:
+        with stage("total"):
+            response = await answer_question(request, emit)
+        status = response.status
+        return response
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except HTTPException as e:
+        trace["error"] = e.detail
+        raise
+    finally:
+        REQUESTS.inc(status=status)
+        trace["status"] = status
+        trace_log.write(trace)
 
-    # Update state
-    CURRENT_MODEL["model_type"] = model_type
 
+async def answer_question(request: QuestionRequest, emit=None) -> AnswerResponse:
+    """
+    Process user question with validation and self-correction.
 
-# Modified ask_question endpoint
-@app.post("/ask-question", response_model=AnswerResponse)
-async def ask_question(request: QuestionRequest):
+    emit is an optional async callback (event, data) used by the streaming
+    endpoint to report each stage as soon as it completes.
+    """
 
     model_type = request.used_model.model_type
 
-    ensure_model_runtime(model_type=model_type, model_path=os.getenv("MODEL_PATH"))
-
-    """Process user question with validation and self-correction"""
     try:
-        if request.session_id not in active_sessions:
+        session_data = await get_session(request.session_id)
+        if session_data is None:
             raise HTTPException(
                 status_code=404,
                 detail="Session not found. Please connect to database first.",
             )
 
-        session_data = active_sessions[request.session_id]
         db = session_data["db"]
         db_type = session_data["db_type"]
+        set_labels(db_type=db_type)
+        trace_set(db_type=db_type)
         question = request.question
+        schema = get_schema(
+            session_data, save=lambda: active_sessions.save(request.session_id)
+        )
+        max_rows = session_data["limits"].max_rows or RESULT_MAX_ROWS
+
+        # Only the tables relevant to the question go into the prompts
+        with stage("schema_link"):
+            linked_schema = link_schema(schema, question)
+        table_info = linked_schema["table_info"]
+        if not linked_schema["fallback"]:
+            logger.info(
+                f"Schema linked to {linked_schema['tables']}, "
+                f"saved ~{linked_schema['tokens_saved']} prompt tokens"
+            )
+        if emit:
+            await emit(
+                "schema",
+                {
+                    "tables": linked_schema["tables"],
+                    "tokens_saved": linked_schema["tokens_saved"],
+                },
+            )
 
-        # Prepare inputs
-        inputs = {
-            "input": question,
-            "table_info": db.table_info,
-        }
-
-        # Use enhanced prompt template
-        sql_prompt = get_enhanced_sql_prompt_template(db_type)
-
-        rephrase_prompt_text = question_rephrase.format(**inputs)
-
-        rephrased_question_text = call_model(rephrase_prompt_text)
-
-        rephrased_question_text = to_text(rephrased_question_text)
-
-        inputs["input"] = rephrased_question_text
-
-        sql_prompt_text = sql_prompt.format(**inputs)
-
-        raw_sql_output = call_model(sql_prompt_text)
+        # A cached question skips the model entirely; if its SQL no longer
+        # runs, drop it and fall back to generation
+        pipeline_mode = request.pipeline_mode or PIPELINE_MODE
+        sql_cache = "miss"
+        cached = None
+        if request.use_cache:
+            cached = question_cache.get(
+                question, schema["fingerprint"], db_type, model_type
+            )
+        if cached is not None:
+            success, query_result, final_query, error_log = (
+                await validate_and_execute_query(
+                    cached["sql"],
+                    db,
+                    db_type,
+                    table_info,
+                    max_retries=0,
+                    scope=session_data["result_scope"],
+                    on_event=emit,
+                    max_rows=max_rows,
+                    schema_index=schema.get("column_index"),
+                    limits=session_data["limits"],
+                )
+            )
+            if success:
+                sql_cache = "hit"
+                rephrased_question_text = cached["rephrased"]
+            else:
+                logger.info(f"Cached SQL failed, regenerating: {query_result}")
+                question_cache.invalidate(
+                    cached["question"], schema["fingerprint"], db_type, model_type
+                )
+
+        if sql_cache == "miss":
+            await ensure_model_runtime(
+                model_type=model_type, model_path=os.getenv("MODEL_PATH")
+            )
 
-        raw_sql_output = to_text(raw_sql_output)
+            # Prepare inputs
+            inputs = {
+                "input": question,
+                "table_info": table_info,
+            }
 
-        initial_query = extract_sql(raw_sql_output)
-        initial_query = normalize_sql_quotes(initial_query)
+            if pipeline_mode == "single_call":
+                # Rephrase and SQL in one structured generation (one prefill)
+                combined_prompt_text = get_rephrase_and_sql_prompt_template(
+                    db_type
+                ).format(**inputs)
+
+                combined_output = await generate(
+                    combined_prompt_text, emit, "rephrase_sql"
+                )
+
+                rephrased_question_text, initial_query = extract_rephrase_and_sql(
+                    combined_output
+                )
+                rephrased_question_text = rephrased_question_text or question
+                if emit:
+                    await emit("rephrased", {"question": rephrased_question_text})
+
+            else:
+                if pipeline_mode == "adaptive" and is_explicit_question(
+                    schema.get("link_index"), question
+                ):
+                    # Already explicit: rephrasing would only cost a round trip
+                    rephrased_question_text = question
+                else:
+                    rephrase_prompt_text = question_rephrase.format(**inputs)
+
+                    rephrased_question_text = await generate(
+                        rephrase_prompt_text, emit, "rephrase"
+                    )
+                if emit:
+                    await emit("rephrased", {"question": rephrased_question_text})
+
+                inputs["input"] = rephrased_question_text
+
+                # Use enhanced prompt template
+                sql_prompt = get_enhanced_sql_prompt_template(db_type)
+
+                sql_prompt_text = sql_prompt.format(**inputs)
+
+                raw_sql_output = await generate(sql_prompt_text, emit, "sql")
+
+                initial_query = extract_sql(raw_sql_output)
+
+            initial_query = normalize_sql_quotes(initial_query)
+            if emit:
+                await emit("sql", {"query": initial_query})
+
+            # Validate and execute with self-correction
+            success, query_result, final_query, error_log = (
+                await validate_and_execute_query(
+                    initial_query,
+                    db,
+                    db_type,
+                    table_info,
+                    max_retries=2,
+                    scope=session_data["result_scope"],
+                    on_event=emit,
+                    max_rows=max_rows,
+                    schema_index=schema.get("column_index"),
+                    limits=session_data["limits"],
+                )
+            )
 
-        # Validate and execute with self-correction
-        success, query_result, final_query, error_log = validate_and_execute_query(
-            initial_query, db, db_type, max_retries=2
+            if success and request.use_cache:
+                question_cache.set(
+                    question,
+                    schema["fingerprint"],
+                    db_type,
+                    model_type,
+                    final_query,
+                    rephrased_question_text,
+                )
+
+        trace_set(
+            pipeline_mode=pipeline_mode,
+            sql_cache=sql_cache,
+            rephrased=rephrased_question_text,
+            initial_sql=cached["sql"] if sql_cache == "hit" else initial_query,
+            final_sql=query_result["executed_query"] if success else final_query,
+            error_log=error_log,
         )
+        if emit:
+            await emit("cache", {"sql_cache": sql_cache})
 
         if not success:
 
@@ -219,17 +622,54 @@ async def ask_question(request: QuestionRequest):
             "..." if not error_log else f"Corrected after {len(error_log)} attempts"
         )
 
-        clean_text = str(query_result)
+        # Rows past the cap stay on the server and are paged on request
+        columns, rows = query_result["columns"], query_result["rows"]
+        result_id = None
+        if query_result["cursor"] is not None:
+            result_id = await asyncio.to_thread(
+                result_store.register,
+                request.session_id,
+                columns,
+                len(rows),
+                query_result["cursor"],
+            )
+
+        # Pretty text only on request; otherwise the rows go out as columns
+        result = None
+        with stage("format"):
+            if request.result_format == "text":
+                answer = await run_db(format_rows, columns, rows)
+            else:
+                if request.result_format == "arrow":
+                    try:
+                        result = await run_db(to_arrow, columns, rows)
+                    except RuntimeError as e:
+                        raise HTTPException(status_code=400, detail=str(e))
+                else:
+                    result = to_columnar(columns, rows)
+                answer = f"{len(rows)} rows"
+                if query_result["truncated"]:
+                    answer += " (truncated)"
+
+        trace_set(row_count=len(rows), truncated=query_result["truncated"])
 
         return AnswerResponse(
             session_id=request.session_id,
             question=question,
             question_rephrased=rephrased_question_text,
             thinking_text=thinking_text,
-            answer=clean_text,
-            generated_sql=final_query,
+            answer=answer,
+            generated_sql=query_result["executed_query"],
             status="success" if not error_log else "success_after_correction",
             used_model=request.used_model,
+            schema_tokens_saved=linked_schema["tokens_saved"],
+            sql_cache=sql_cache,
+            pipeline_mode=pipeline_mode,
+            row_count=len(rows),
+            truncated=query_result["truncated"],
+            result_id=result_id,
+            result=result,
+            cost_warning=query_result["cost_warning"],
         )
 
     except HTTPException:
@@ -242,6 +682,104 @@ async def ask_question(request: QuestionRequest):
         )
 
 
+@app.post("/ask-question", response_model=AnswerResponse)
+async def ask_question(request: QuestionRequest, http_request: Request):
+    """Process user question with validation and self-correction"""
+    try:
+        return await cancel_on_disconnect(http_request, run_question_pipeline(request))
+    except ClientDisconnected:
+        # Pending model call and DB query were cancelled with the pipeline
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+
+@app.post("/ask-question/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    Same pipeline as /ask-question, reported as Server-Sent Events:
+    schema, token, rephrased, sql, attempt, correction, rows, cache and
+    finally answer (or error).
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def emit(event: str, data):
+        await queue.put((event, data))
+
+    async def run():
+        try:
+            answer = await run_question_pipeline(request, emit)
+            await emit("answer", answer)
+        except HTTPException as e:
+            await emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            await emit("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(run())
+
+    async def event_stream():
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                event, data = item
+                payload = json.dumps(jsonable_encoder(data), default=str)
+                yield f"event: {event}\ndata: {payload}\n\n"
+        finally:
+            # Client went away: stop the pipeline instead of finishing it
+            task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/result/{result_id}/page", response_model=ResultPage)
+async def get_result_page(result_id: str, page: int = 1):
+    """
+    Further pages of a truncated answer. Page 0 is the rows returned with the
+    answer; pages 1.. are read from the spilled cursor, waiting for the spill
+    to reach them if necessary.
+    """
+    if page < 1:
+        raise HTTPException(status_code=400, detail="Pages start at 1")
+
+    deadline = time.monotonic() + RESULT_PAGE_WAIT_SECONDS
+    while True:
+        # Spilled by another worker: a fresh snapshot of its progress each time
+        entry = await asyncio.to_thread(result_store.get, result_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Result not found or expired")
+        done = entry["done"]
+        rows = await asyncio.to_thread(result_store.read_page, entry, page)
+        if rows is not None or done:
+            break
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=504, detail="Result page not ready; try again later"
+            )
+        await asyncio.sleep(0.05)
+
+    if rows is None:
+        if entry["error"]:
+            raise HTTPException(
+                status_code=500, detail=f"Result paging failed: {entry['error']}"
+            )
+        raise HTTPException(status_code=404, detail="Page out of range")
+
+    return ResultPage(
+        result_id=result_id,
+        page=page,
+        columns=entry["columns"],
+        rows=[list(row) for row in rows],
+        has_more=page < len(entry["pages"]) or not entry["done"],
+        complete=entry["done"] and not entry["capped"],
+    )
+
+
 @app.get("/supported-databases")
 async def get_supported_databases():
     """Get list of supported database types"""
@@ -286,9 +824,8 @@ async def get_supported_databases():
     }
 
 
-@app.get("/sessions")
-async def get_active_sessions():
-    """Get list of active sessions"""
+def list_sessions() -> dict:
+    """Sessions in the store and its stats (blocking, reads the backend)"""
     sessions = []
     for session_id, data in active_sessions.items():
         sessions.append(
@@ -296,32 +833,117 @@ async def get_active_sessions():
                 "session_id": session_id,
                 "table_names": data["table_names"],
                 "db_type": data["db_type"],
+                "idle_seconds": round(active_sessions.idle_seconds(session_id), 1),
+                "memory_bytes": active_sessions.session_bytes(session_id),
             }
         )
-    return {"active_sessions": sessions}
+    return {"active_sessions": sessions, "store": active_sessions.stats()}
+
+
+@app.get("/sessions")
+async def get_active_sessions():
+    """Get list of active sessions"""
+    return await asyncio.to_thread(list_sessions)
+
+
+@app.post("/session/{session_id}/refresh-schema", response_model=DatabaseResponse)
+async def refresh_session_schema(session_id: str):
+    """Rebuild the cached schema snapshot for a session"""
+    session_data = await get_session(session_id)
+    if session_data is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        schema = await refresh_schema(session_data)
+        saved = await asyncio.to_thread(active_sessions.save, session_id)
+    except Exception as e:
+        logger.error(f"Schema refresh error: {e}")
+        raise HTTPException(
+            status_code=400, detail=f"Schema refresh failed: {str(e)}"
+        )
+    if not saved:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return DatabaseResponse(
+        session_id=session_id,
+        status="success",
+        message=f"Schema refreshed. Available tables: {', '.join(schema['table_names'])}",
+        table_info=schema["table_info"],
+    )
+
+
+@app.delete("/session/{session_id}/result-cache")
+async def clear_session_result_cache(session_id: str):
+    """Drop cached query results for a session's database"""
+    session_data = await get_session(session_id)
+    if session_data is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    removed = result_cache.invalidate(session_data["result_scope"])
+    return {"message": f"Removed {removed} cached results for session {session_id}"}
 
 
 @app.delete("/session/{session_id}")
 async def close_session(session_id: str):
     """Close a database session"""
-    if session_id in active_sessions:
-        del active_sessions[session_id]
+    session_data = await asyncio.to_thread(active_sessions.pop, session_id, None)
+    if session_data is not None:
+        release_session(session_id, session_data)
         return {"message": f"Session {session_id} closed successfully"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
 
 
+@app.get("/ready")
+async def readiness(model_type: Optional[str] = None):
+    """Ready once the configured (or given) model backend is loaded and warm"""
+    model_type = model_type or DEFAULT_MODEL_TYPE
+    if not model_type:
+        return {"ready": True, "model_type": None}
+
+    task = _model_warmups.get(model_type)
+    if task is None:
+        status = "ready" if is_model_server_alive(model_type) else "not_started"
+    elif not task.done():
+        status = "warming_up"
+    elif task.cancelled() or task.exception() is not None:
+        status = "failed"
+    else:
+        status = "ready" if is_model_server_alive(model_type) else "not_started"
+
+    body = {"ready": status == "ready", "model_type": model_type, "status": status}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    sessions = await asyncio.to_thread(active_sessions.stats)
     return {
         "status": "healthy",
         "models_loaded": llm1 is not None and llm2 is not None,
-        "active_sessions": len(active_sessions),
+        "model_server": model_server_status(),
+        "active_sessions": sessions["sessions"],
+        "sessions": sessions,
+        "question_cache": question_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "sql_repair": repair_stats(),
+        "db_pools": pool_stats(),
+        "trace_log": trace_log.stats(),
     }
 
 
-if __name__ == "_main_":
+@app.get("/metrics")
+async def metrics():
+    """Stage latencies, retry/correction/error counters and prompt sizes"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Several workers need sessions every worker can see
+    if API_WORKERS > 1 and "SESSION_BACKEND" not in os.environ:
+        os.environ["SESSION_BACKEND"] = "sqlite"
+
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
@@ -0,0 +1,265 @@
+from contextlib import contextmanager
+from trace_log import trace_stage
+import contextvars
+import threading
+import bisect
+import math
+import time
+import os
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Prometheus text exposition format served by /metrics
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cached answer (ms) to a slow local generation (minutes)
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+)
+
+# Labels shared by every metric recorded while handling one request
+# (db_type, model_type), so the code timing a stage need not thread them
+_context_labels = contextvars.ContextVar("metric_labels", default={})
+
+
+def set_labels(**labels):
+    """Default label values for metrics recorded in the current task"""
+    _context_labels.set({**_context_labels.get(), **labels})
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Text exposition of every metric that has samples"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            samples = metric._samples()
+            if samples:
+                lines.extend(metric._header() + samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if not self.labelnames:
+            return ()
+        defaults = _context_labels.get()
+        return tuple(
+            str(labels.get(n, defaults.get(n, "")) or "") for n in self.labelnames
+        )
+
+    def _header(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Last set value per label set; set_function reads it at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function = None
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn):
+        """Report fn() (unlabelled gauge) instead of a stored value"""
+        self._function = fn
+
+    def _samples(self) -> list:
+        if self._function is None:
+            return super()._samples()
+        try:
+            value = float(self._function())
+        except Exception:
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = [
+                (key, list(counts), total)
+                for key, (counts, total) in self._values.items()
+            ]
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                labels = _format_labels(self.labelnames, key, le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observe the wall time of the with-block, also when it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# Question pipeline (main.app); db_type and model_type come from set_labels.
+# Stages: schema_link, rephrase, sql, rephrase_sql (single_call generation),
+# validation, repair, correction, db_execution, format and total
+PIPELINE_LABELS = ("db_type", "model_type")
+
+STAGE_SECONDS = Histogram(
+    "text2sql_stage_seconds",
+    "Time spent in each question pipeline stage",
+    ("stage",) + PIPELINE_LABELS,
+)
+REQUESTS = Counter(
+    "text2sql_requests_total",
+    "Questions answered, by outcome",
+    PIPELINE_LABELS + ("status",),
+)
+RETRIES = Counter(
+    "text2sql_retries_total",
+    "Failed SQL attempts that were retried",
+    PIPELINE_LABELS,
+)
+CORRECTIONS = Counter(
+    "text2sql_corrections_total",
+    "SQL corrections, by source (repair = rule-based, llm = model)",
+    PIPELINE_LABELS + ("source",),
+)
+ERRORS = Counter(
+    "text2sql_errors_total",
+    "Failed SQL attempts, by source "
+    "(sqlglot, db_error, timeout, cost_guard, correction)",
+    PIPELINE_LABELS + ("source",),
+)
+PROMPT_TOKENS = Gauge(
+    "text2sql_prompt_tokens",
+    "Estimated tokens of the last prompt sent, by prompt kind",
+    ("prompt",) + PIPELINE_LABELS,
+)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a pipeline stage into text2sql_stage_seconds and the request's
+    trace record
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace_stage(name, elapsed)
@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
+from typing import List
 from langchain_core.output_parsers import StrOutputParser
-from utils import is_ollama_running, start_ollama, stop_ollama
+from utils import is_ollama_running, start_ollama
+from utils import cancel_on_disconnect, ClientDisconnected
+from batching import BatchScheduler
+from metrics import Gauge, Histogram, timed, render_metrics, CONTENT_TYPE
 
 import os
+import asyncio
 import logging
 import sys
 
@@ -13,18 +19,44 @@ sys.path.append("C:/Users/hasan/Desktop/TEXT_WITH_DB/src/DB_connection")
 from localmodel import load_local_models
 from Mistral import load_mistral_models
 from OpenAI import load_OpenAI_model
+from Stub import load_stub_models
 
 logger = logging.getLogger("model_server")
 app = FastAPI()
 
 LLM1 = None
 LLM2 = None
+CHAIN = None  # LLM1 | StrOutputParser(), built once when the model loads
+SCHEDULER = None
+
+# Micro-batching: prompts arriving within BATCH_WINDOW_MS are generated together
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+# LlamaCpp runs in-process and must not be called from two threads at once
+BATCH_MAX_INFLIGHT = int(os.getenv("BATCH_MAX_INFLIGHT", "4"))
+
+QUEUE_DEPTH = Gauge(
+    "model_server_queue_depth", "Prompts waiting for the batching scheduler"
+)
+QUEUE_DEPTH.set_function(lambda: SCHEDULER.queue_depth if SCHEDULER is not None else 0)
+GENERATE_SECONDS = Histogram(
+    "model_server_generate_seconds",
+    "Time from request to completed generation, queueing included",
+    ("endpoint",),
+)
 
 
 class GenReq(BaseModel):
     prompt: str
     max_tokens: int = 1024
     temperature: float = 0.0
+    stream: bool = False
+
+
+class GenBatchReq(BaseModel):
+    prompts: List[str]
+    max_tokens: int = 1024
+    temperature: float = 0.0
 
 
 @app.on_event("startup")
@@ -36,10 +68,10 @@ def load_model():
 
     logger.info(f"Starting model server with MODEL_TYPE={model_type}")
 
+    # Other backends may be kept warm alongside this one (see
+    # subprocess_manager), so Ollama is left running here
     if model_type == "Local Text2SQL":
-        if is_ollama_running():
-            stop_ollama()
-        LLM1, LLM2 = load_local_models()  
+        LLM1, LLM2 = load_local_models()
         logger.info("Loaded Local LlamaCpp Text2SQL model")
 
     elif model_type == "Mistral":
@@ -47,34 +79,97 @@ def load_model():
             logger.info("Ollama is already running")
         else:
             logger.info("Starting Ollama...")
-            start_ollama()    
-            if is_ollama_running():
-                logger.info("Ollama started successfully")
-                LLM1, LLM2 = load_mistral_models()
-                logger.info("Loaded Mistral local model")
-            else:
-                logger.error("Failed to start Ollama")
+            start_ollama()
+        if is_ollama_running():
+            logger.info("Ollama started successfully")
+            LLM1, LLM2 = load_mistral_models()
+            logger.info("Loaded Mistral local model")
+        else:
+            logger.error("Failed to start Ollama")
 
     elif model_type == "OpenAi":
-        if is_ollama_running():
-            stop_ollama()
         LLM1, LLM2 = load_OpenAI_model()
         logger.info("Loaded OpenAI models")
 
+    elif model_type == "Stub":
+        LLM1, LLM2 = load_stub_models()
+        logger.info("Loaded stub models")
+
     else:
         raise ValueError(f"Invalid MODEL_TYPE: {model_type}")
 
 
-@app.post("/generate")
-def generate(req: GenReq):
-    global LLM1
+@app.on_event("startup")
+async def start_scheduler():
+    global CHAIN, SCHEDULER
 
     if LLM1 is None:
+        return
+
+    CHAIN = LLM1 | StrOutputParser()
+
+    max_inflight = 1 if os.getenv("MODEL_TYPE") == "Local Text2SQL" else BATCH_MAX_INFLIGHT
+    SCHEDULER = BatchScheduler(
+        CHAIN,
+        window_ms=BATCH_WINDOW_MS,
+        max_size=BATCH_MAX_SIZE,
+        max_inflight=max_inflight,
+    )
+    SCHEDULER.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    if SCHEDULER is not None:
+        await SCHEDULER.stop()
+
+
+@app.get("/healthz")
+async def healthz():
+    """Cheap readiness probe: loaded model type and batching queue depth"""
+    return {
+        "status": "ready" if CHAIN is not None else "not_loaded",
+        "ready": CHAIN is not None,
+        "model_type": os.getenv("MODEL_TYPE"),
+        "queue_depth": SCHEDULER.queue_depth if SCHEDULER is not None else 0,
+    }
+
+
+@app.post("/generate")
+async def generate(req: GenReq, request: Request):
+    if CHAIN is None:
         return {"error": "Model not loaded"}
-        
-    chain = LLM1 | StrOutputParser()
 
-    out = chain.invoke(req.prompt)
+    if req.stream:
+        # Plain-text chunks as the model produces them, within the
+        # scheduler's in-flight limit like any batch
+        return StreamingResponse(
+            SCHEDULER.stream(req.prompt), media_type="text/plain; charset=utf-8"
+        )
+
+    # A caller that gave up (cancelled pipeline) is dropped from the queue
+    try:
+        with timed(GENERATE_SECONDS, endpoint="generate"):
+            out = await cancel_on_disconnect(request, SCHEDULER.submit(req.prompt))
+    except ClientDisconnected:
+        return {"error": "Client disconnected"}
     return {"text": out}
 
 
+@app.post("/generate_batch")
+async def generate_batch(req: GenBatchReq):
+    """Generate several prompts; they share batches with concurrent /generate calls"""
+    if CHAIN is None:
+        return {"error": "Model not loaded"}
+
+    with timed(GENERATE_SECONDS, endpoint="generate_batch"):
+        texts = await asyncio.gather(*(SCHEDULER.submit(p) for p in req.prompts))
+    return {"texts": list(texts)}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Queue depth and generation latency in Prometheus text format"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
@@ -75,8 +75,8 @@ SQL Query:"""
     )
 
 
-def get_enhanced_sql_prompt_template(db_type: str) -> PromptTemplate:
-    """Enhanced SQL prompt template with better join handling"""
+def _enhanced_dialect_parts(db_type: str):
+    """Dialect name, instructions and examples shared by the enhanced prompts"""
 
     db_type = db_type.lower()
 
@@ -104,6 +104,16 @@ SQL Query: SELECT * FROM "employees" LIMIT 1;"""
         example_snippet = """Question: Return the first row from the employees table  
 SQL Query: SELECT * FROM employees LIMIT 1;"""
 
+    return dialect_info, specific_instructions, example_snippet
+
+
+def get_enhanced_sql_prompt_template(db_type: str) -> PromptTemplate:
+    """Enhanced SQL prompt template with better join handling"""
+
+    dialect_info, specific_instructions, example_snippet = _enhanced_dialect_parts(
+        db_type
+    )
+
     return PromptTemplate.from_template(
         f"""You are a {dialect_info} expert specializing in complex queries.
 Your task is to generate only a single **SELECT** query that answers the question.
@@ -141,6 +151,49 @@ SQL Query:"""
     )
 
 
+def get_rephrase_and_sql_prompt_template(db_type: str) -> PromptTemplate:
+    """Single-call prompt: rephrase the question and write the SQL in one generation"""
+
+    dialect_info, specific_instructions, example_snippet = _enhanced_dialect_parts(
+        db_type
+    )
+
+    return PromptTemplate.from_template(
+        f"""You are a {dialect_info} expert specializing in complex queries.
+First rewrite the user's question into a clear, unambiguous, SQL-friendly form,
+then write a single **SELECT** query that answers it.
+
+Rules:
+- Keep all the original intent; do NOT add information that wasn't in the question.
+- Use explicit references to tables, columns and filters in the rephrased question.
+- Only output one SELECT statement, nothing else.
+- Do NOT generate CREATE, INSERT, UPDATE, DELETE, DROP, ALTER, or comments.
+- Use {dialect_info} syntax correctly.
+- {specific_instructions}
+- Always use explicit JOIN syntax with ON conditions and table aliases.
+
+Output exactly two lines in this format:
+Rephrased Question: <rephrased question>
+SQL Query: <SELECT statement>;
+
+### Output Example
+User Question: "How many people work here?"
+Rephrased Question: Show the total number of employees in the employees table.
+SQL Query: SELECT COUNT(*) FROM employees;
+
+### SQL Examples
+{example_snippet}
+
+---
+
+Schema:
+{{table_info}}
+
+User Question: {{input}}
+Rephrased Question:"""
+    )
+
+
 answer_prompt = PromptTemplate.from_template(
     """You are given a user question, a SQL query, and the SQL result. 
 Return *only* the final answer to the question as a short human-readable sentence, 
@@ -1,31 +1,259 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from tabulate import tabulate
 from sqlalchemy import text
 from langchain_core.runnables import RunnableLambda
 from utils import to_text
 from utils import extract_sql, normalize_sql_quotes
 from prompts import correction_prompt
-from utils import call_model, sqlglot_validate
+from utils import call_model, sqlglot_validate, canonicalize_sql
+from caches import ResultCache
+from result_store import ResultStore, OpenCursor
+from sql_repair import repair_sql, record_saved, SQL_REPAIR_MAX_PASSES
+from cost_guard import guard_query, CostGuardError
+from db_timeouts import QueryHandle, QueryCancelledError, StatementTimeoutError
+from metrics import stage, CORRECTIONS, ERRORS, RETRIES, PROMPT_TOKENS
+from schema_linking import estimate_tokens
+import asyncio
+import os
 
 
+# Blocking DB work (SQLAlchemy connect/execute/fetch, schema reflection) runs on
+# this bounded pool so that slow queries never stall the event loop.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
 
-def validate_and_execute_query(query: str, db, db_type: str, max_retries: int = 2):
+_db_executor = ThreadPoolExecutor(
+    max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db-exec"
+)
+
+# Rows per "rows" event when results are streamed
+STREAM_ROWS_CHUNK = int(os.getenv("STREAM_ROWS_CHUNK", "500"))
+
+# Default cap on rows returned with an answer (sessions may override it)
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "1000"))
+
+# Rows of recently executed queries, shared by sessions on the same database
+result_cache = ResultCache()
+
+# Pages of truncated results beyond the first one (spilled on their own pool)
+result_store = ResultStore()
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking database call on the DB executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, partial(fn, *args, **kwargs))
+
+
+def result_scope(db) -> tuple:
+    """Result cache scope for a session: connection URI and its table set"""
+    return (str(db._engine.url), tuple(sorted(db.get_usable_table_names())))
+
+
+def fetch_rows(db, query: str, max_rows: int = None, handle: QueryHandle = None):
+    """
+    Execute a SELECT on a server-side cursor and return (columns, rows, cursor)
+    (blocking, call through run_db). At most max_rows rows are fetched; when
+    more exist, cursor is an OpenCursor still holding the connection so the
+    rest can be paged, otherwise it is None. handle applies the statement
+    timeout and lets another thread cancel the query.
+    """
+    conn = db._engine.connect()
+    try:
+        if handle is not None:
+            query = handle.start(conn, query)
+
+        result_proxy = conn.execution_options(stream_results=True).execute(
+            text(query)
+        )
+        columns = tuple(result_proxy.keys())
+
+        if max_rows is None:
+            rows = [tuple(row) for row in result_proxy.fetchall()]
+        else:
+            rows = [tuple(row) for row in result_proxy.fetchmany(max_rows + 1)]
+
+        if max_rows is None or len(rows) <= max_rows:
+            if handle is not None:
+                handle.finish()
+            conn.close()
+            return columns, rows, None
+
+        cursor = OpenCursor(conn, result_proxy, rows[max_rows:])
+        if handle is not None:
+            handle.finish(cursor)
+        return columns, rows[:max_rows], cursor
+
+    except QueryCancelledError:
+        conn.close()
+        raise
+
+    except Exception as e:
+        if handle is None:
+            conn.close()
+            raise
+        handle.finish()
+        conn.close()
+        error = handle.translate(e)
+        if error is e:
+            raise
+        raise error from e
+
+
+def format_rows(columns, rows) -> str:
+    return tabulate(rows, headers=columns, tablefmt="pretty")
+
+
+def execute_query(
+    db,
+    query: str,
+    scope: tuple = None,
+    db_type: str = "",
+    max_rows: int = None,
+    limits=None,
+    handle: QueryHandle = None,
+):
+    """
+    Execute a SELECT and return (columns, rows, cursor, cost_notice)
+    (blocking, call through run_db). With a scope, complete (untruncated)
+    results are served from and stored in the result cache. Queries that
+    miss the cache pass the EXPLAIN cost guard first, which may reject them
+    (CostGuardError) or add a LIMIT; cost_notice then describes what it did.
+    handle carries the statement timeout and cancellation (see fetch_rows).
+    """
+    if scope is not None:
+        canonical = canonicalize_sql(query, db_type)
+        cached = result_cache.get(scope, canonical)
+        if cached is not None and (max_rows is None or len(cached[1]) <= max_rows):
+            return cached[0], cached[1], None, None
+
+    executed, notice = guard_query(db, query, db_type, limits, max_rows)
+
+    columns, rows, cursor = fetch_rows(db, executed, max_rows, handle)
+    if scope is not None and cursor is None and executed == query:
+        result_cache.set(scope, canonical, columns, rows)
+
+    return columns, rows, cursor, notice
+
+
+async def request_correction(query: str, error: str, db_type: str, table_info: str):
+    """Ask the model to fix a failing query and return the extracted SQL"""
+    inputs = {
+        "query": query,
+        "error": error,
+        "db_type": db_type,
+        "table_info": table_info,
+    }
+
+    correction_prompt_text = correction_prompt.format(**inputs)
+    PROMPT_TOKENS.set(estimate_tokens(correction_prompt_text), prompt="correction")
+
+    corrected_output = await call_model(correction_prompt_text)
+
+    corrected_output = to_text(corrected_output)
+
+    corrected_query = extract_sql(corrected_output)
+
+    return normalize_sql_quotes(corrected_query)
+
+
+async def validate_and_execute_query(
+    query: str,
+    db,
+    db_type: str,
+    table_info: str,
+    max_retries: int = 2,
+    scope: tuple = None,
+    on_event=None,
+    max_rows: int = RESULT_MAX_ROWS,
+    schema_index: dict = None,
+    limits=None,
+):
     """
     Validates and executes SQL query with automatic sqlglot-based error detection
-    and LLM-powered correction.
-    Returns: (success: bool, result: str, final_query: str, error_log: list)
+    and LLM-powered correction. table_info comes from the session schema snapshot
+    so correction rounds never re-reflect the database; scope enables the
+    result cache. on_event, if given, is awaited with (event, data) for every
+    failed attempt, correction and chunk of result rows. At most max_rows rows
+    are fetched. schema_index (the snapshot's column_index) lets sqlglot reject
+    unknown tables and columns before the query reaches the database.
+    Mechanical mistakes are first fixed by the rule-based repair pass, which
+    does not use up a correction attempt; only then is the model asked.
+    limits (the session's SessionLimits) sets the cost guard thresholds and
+    the statement timeout; a query rejected by the guard is corrected like any
+    other failing query, one that times out is not retried. Cancelling the
+    calling task cancels the query on the database.
+    Returns: (success: bool, result, final_query: str, error_log: list) where
+    result is {"columns", "rows", "truncated", "cursor", "cost_warning",
+    "executed_query"} on success and the error message otherwise.
+    final_query never includes the cost guard's LIMIT (it is safe to cache
+    for other sessions); executed_query is the SQL that actually ran. A
+    result cut by the guard is truncated without a cursor to page.
     """
 
     error_log = []
     current_query = query  # after regex extraction
 
-    for attempt in range(max_retries + 1):
-
-        is_valid, validation_error = sqlglot_validate(current_query, db.table_info)
+    async def log_error(entry: dict):
+        error_log.append(entry)
+        ERRORS.inc(source=entry["source"])
+        if on_event:
+            await on_event("attempt", entry)
+
+    async def correct(error_msg: str) -> str:
+        nonlocal repaired_entry
+        repaired_entry = None
+        with stage("correction"):
+            corrected = await request_correction(
+                current_query, error_msg, db_type, table_info
+            )
+        CORRECTIONS.inc(source="llm")
+        RETRIES.inc()
+        if on_event:
+            await on_event("correction", {"query": corrected})
+        return corrected
+
+    repairs = 0
+    repaired_entry = None  # set while current_query comes from the repair pass
+
+    async def repair(error_msg: str) -> bool:
+        nonlocal current_query, repairs, repaired_entry
+        if repairs >= SQL_REPAIR_MAX_PASSES:
+            return False
+        with stage("repair"):
+            fixed, fixes = repair_sql(current_query, db_type, schema_index)
+        if fixed is None or fixed == current_query:
+            return False
+
+        repairs += 1
+        CORRECTIONS.inc(source="repair")
+        RETRIES.inc()
+        repaired_entry = {
+            "attempt": attempt + 1,
+            "query": fixed,
+            "error": error_msg,
+            "fixes": fixes,
+            "source": "repair",
+            "saved_llm_call": False,
+        }
+        error_log.append(repaired_entry)
+        if on_event:
+            await on_event("correction", {"query": fixed, "source": "repair"})
+        current_query = fixed
+        return True
+
+    attempt = 0
+    while attempt <= max_retries:
+
+        with stage("validation"):
+            is_valid, validation_error = sqlglot_validate(
+                current_query, schema_index, db_type
+            )
 
         if not is_valid:
             error_msg = validation_error
 
-            error_log.append(
+            await log_error(
                 {
                     "attempt": attempt + 1,
                     "query": current_query,
@@ -34,31 +262,20 @@ def validate_and_execute_query(query: str, db, db_type: str, max_retries: int =
                 }
             )
 
+            if await repair(error_msg):
+                continue
+
             if attempt >= max_retries:
                 return False, error_msg, current_query, error_log
 
             try:
-
-                inputs = {
-                    "query": current_query,
-                    "error": error_msg,
-                    "db_type": db_type,
-                    "table_info": db.table_info,
-                }
-
-                correction_prompt = correction_prompt.format(**inputs)
-
-                corrected_output = call_model(correction_prompt)
-
-                corrected_output = to_text(corrected_output)
-
-                current_query = extract_sql(corrected_output)
-
-                current_query = normalize_sql_quotes(current_query)
+                current_query = await correct(error_msg)
+                attempt += 1
 
                 continue
 
             except Exception as correction_error:
+                ERRORS.inc(source="correction")
                 error_log.append(
                     {"attempt": attempt + 1, "correction_error": str(correction_error)}
                 )
@@ -69,51 +286,107 @@ def validate_and_execute_query(query: str, db, db_type: str, max_retries: int =
                     error_log,
                 )
 
+        timeout = getattr(limits, "statement_timeout_seconds", None)
+        handle = QueryHandle(db_type, timeout)
         try:
-            with db._engine.connect() as conn:
-                result_proxy = conn.execute(text(current_query))
-                rows = result_proxy.fetchall()
-                columns = result_proxy.keys()
-
-            result = tabulate(rows, headers=columns, tablefmt="pretty")
+            try:
+                with stage("db_execution"):
+                    columns, rows, cursor, cost_notice = await run_db(
+                        execute_query,
+                        db,
+                        current_query,
+                        scope,
+                        db_type,
+                        max_rows,
+                        limits,
+                        handle,
+                    )
+            except asyncio.CancelledError:
+                # The client went away: stop the query on the database too
+                handle.cancel()
+                raise
+
+            # The guard's rewrite is what ran, but the session-independent
+            # SQL (current_query) is what callers cache
+            executed_query = current_query
+            truncated = cursor is not None
+            if cost_notice is not None and "query" in cost_notice:
+                executed_query = cost_notice["query"]
+                # Rows past the guard's LIMIT were never selected, so the
+                # extra row only marks truncation: there is nothing to page
+                if cursor is not None:
+                    await run_db(cursor.close)
+                    cursor = None
+
+            if on_event:
+                try:
+                    if cost_notice is not None:
+                        await on_event("cost", cost_notice)
+                    for start in range(0, len(rows), STREAM_ROWS_CHUNK):
+                        await on_event(
+                            "rows",
+                            {
+                                "columns": list(columns),
+                                "rows": rows[start : start + STREAM_ROWS_CHUNK],
+                                "offset": start,
+                            },
+                        )
+                except BaseException:
+                    # Stream cancelled: don't leave the cursor's connection open
+                    if cursor is not None:
+                        await run_db(cursor.close)
+                    raise
+
+            if repaired_entry is not None:
+                repaired_entry["saved_llm_call"] = True
+                record_saved()
+
+            result = {
+                "columns": list(columns),
+                "rows": rows,
+                "truncated": truncated,
+                "cursor": cursor,
+                "cost_warning": cost_notice["message"] if cost_notice else None,
+                "executed_query": executed_query,
+            }
 
             return True, result, current_query, error_log
 
         except Exception as e:
             error_msg = str(e)
 
-            error_log.append(
+            if isinstance(e, StatementTimeoutError):
+                source = "timeout"
+            elif isinstance(e, CostGuardError):
+                source = "cost_guard"
+            else:
+                source = "db_error"
+
+            await log_error(
                 {
                     "attempt": attempt + 1,
                     "query": current_query,
                     "error": error_msg,
-                    "source": "db_error",
+                    "source": source,
                 }
             )
 
-            if attempt >= max_retries:
+            # Another slow attempt would only hold the connection longer
+            if source == "timeout":
                 return False, error_msg, current_query, error_log
 
-            try:
-
-                inputs = {
-                    "query": current_query,
-                    "error": error_msg,
-                    "db_type": db_type,
-                    "table_info": db.table_info,
-                }
-
-                correction_prompt = correction_prompt.format(**inputs)
-
-                corrected_output = call_model(correction_prompt)
-
-                corrected_output = to_text(corrected_output)
+            if await repair(error_msg):
+                continue
 
-                current_query = extract_sql(corrected_output)
+            if attempt >= max_retries:
+                return False, error_msg, current_query, error_log
 
-                current_query = normalize_sql_quotes(current_query)
+            try:
+                current_query = await correct(error_msg)
+                attempt += 1
 
             except Exception as correction_error:
+                ERRORS.inc(source="correction")
                 error_log.append(
                     {"attempt": attempt + 1, "correction_error": str(correction_error)}
                 )
@@ -0,0 +1,91 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+import base64
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow encoding is optional
+    pa = None
+
+
+_TYPE_NAMES = [
+    (bool, "bool"),
+    (int, "int"),
+    (float, "float"),
+    (Decimal, "decimal"),
+    (datetime, "datetime"),
+    (date, "date"),
+    (time, "time"),
+    (str, "str"),
+    (bytes, "bytes"),
+]
+
+
+def _dtype(values) -> str:
+    """Type name of the first non-null value in a column"""
+    for value in values:
+        if value is None:
+            continue
+        for python_type, name in _TYPE_NAMES:
+            if isinstance(value, python_type):
+                return name
+        return type(value).__name__
+    return "null"
+
+
+def unique_columns(columns) -> list:
+    """Make column names unique (joins often return several "id" columns)"""
+    columns = [str(column) for column in columns]
+    used = set(columns)  # never rename into a name the result already has
+    seen = {}
+    names = []
+    for name in columns:
+        if name in seen:
+            base = name
+            while name in used:
+                seen[base] += 1
+                name = f"{base}_{seen[base]}"
+            used.add(name)
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def to_columnar(columns, rows) -> dict:
+    """
+    Columnar payload understood by the frontend's dataframe branch:
+    {"type": "dataframe", "columns", "dtypes", "data": {column: [values]}}
+    """
+    names = unique_columns(columns)
+    arrays = [list(values) for values in zip(*rows)] if rows else [[] for _ in names]
+
+    return {
+        "type": "dataframe",
+        "columns": names,
+        "dtypes": [_dtype(values) for values in arrays],
+        "data": dict(zip(names, arrays)),
+        "row_count": len(rows),
+    }
+
+
+def to_arrow(columns, rows) -> dict:
+    """Base64-encoded Arrow IPC stream of the rows (requires pyarrow)"""
+    if pa is None:
+        raise RuntimeError("Arrow encoding requires the pyarrow package")
+
+    names = unique_columns(columns)
+    arrays = [list(values) for values in zip(*rows)] if rows else [[] for _ in names]
+    table = pa.table(dict(zip(names, arrays)))
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    return {
+        "type": "arrow",
+        "encoding": "base64",
+        "columns": names,
+        "row_count": len(rows),
+        "data": base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii"),
+    }
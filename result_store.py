@@ -0,0 +1,280 @@
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import logging
+import pickle
+import shutil
+import time
+import uuid
+import os
+
+logger = logging.getLogger("result_store")
+
+# Rows past the first page are drained from the open cursor into a spill file
+RESULT_SPILL_MAX_ROWS = int(os.getenv("RESULT_SPILL_MAX_ROWS", "1000000"))
+RESULT_TTL_SECONDS = float(os.getenv("RESULT_TTL_SECONDS", "600"))
+RESULT_SPILL_DIR = os.getenv("RESULT_SPILL_DIR", "")
+# Spills run on their own pool so they never occupy the DB executor. Each
+# running or queued spill holds a pooled connection, so past
+# RESULT_SPILL_MAX_PENDING the extra rows are dropped instead of paged.
+RESULT_SPILL_WORKERS = int(os.getenv("RESULT_SPILL_WORKERS", "2"))
+RESULT_SPILL_MAX_PENDING = int(os.getenv("RESULT_SPILL_MAX_PENDING", "8"))
+# How often a running spill publishes its progress to the shared index
+RESULT_PUBLISH_SECONDS = float(os.getenv("RESULT_PUBLISH_SECONDS", "0.2"))
+# How long a page request waits for the spill to reach the page; a spill
+# whose worker died stops progressing and would otherwise be waited on forever
+RESULT_PAGE_WAIT_SECONDS = float(os.getenv("RESULT_PAGE_WAIT_SECONDS", "30"))
+
+# Entry fields other workers need to read pages from the spill file
+SHARED_FIELDS = (
+    "session_id", "columns", "page_size", "path", "pages", "rows",
+    "done", "capped", "error", "created_at",
+)
+
+
+class OpenCursor:
+    """A streaming result whose first page was returned; owns its connection"""
+
+    def __init__(self, conn, result, pending_rows):
+        self.conn = conn
+        self.result = result
+        self.pending_rows = pending_rows  # already fetched past the first page
+
+    def close(self):
+        try:
+            self.result.close()
+        finally:
+            self.conn.close()
+
+
+class ResultStore:
+    """
+    Further pages of truncated results. After the first page is returned, the
+    open cursor is drained on a small dedicated executor into a per-result
+    spill file of pickled pages, then its connection is released. Pages can be
+    read while the spill is still running.
+
+    With a shared index (the SQLite session backend), entries are published
+    there as the spill progresses, so any API worker on the host can serve
+    the pages; the spill directory must then be readable by all of them.
+    """
+
+    def __init__(
+        self,
+        executor=None,
+        ttl_seconds: float = RESULT_TTL_SECONDS,
+        max_pending: int = RESULT_SPILL_MAX_PENDING,
+    ):
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=RESULT_SPILL_WORKERS, thread_name_prefix="result-spill"
+        )
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self._entries = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._dir = None
+        self.shared = None  # put_result/get_result/delete_result, see share()
+
+    def share(self, index):
+        """Publish entries to an index shared by all API workers"""
+        self.shared = index
+
+    def _publish(self, result_id: str, entry: dict):
+        if self.shared is None:
+            return
+        with self._lock:
+            if entry["cancelled"]:
+                return
+            try:
+                self.shared.put_result(
+                    result_id, {field: entry[field] for field in SHARED_FIELDS}
+                )
+            except Exception as e:
+                logger.error(f"Publishing result {result_id} failed: {e}")
+
+    def _spill_dir(self) -> str:
+        if self._dir is None:
+            if RESULT_SPILL_DIR:
+                os.makedirs(RESULT_SPILL_DIR, exist_ok=True)
+            self._dir = tempfile.mkdtemp(
+                prefix="dbgpt-results-", dir=RESULT_SPILL_DIR or None
+            )
+        return self._dir
+
+    def register(self, session_id: str, columns, page_size: int, cursor: OpenCursor):
+        """
+        Start spilling an open cursor and return the result id for paging, or
+        None (cursor closed) when too many spills are already pending
+        """
+        self.purge_expired()
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                full = True
+            else:
+                full = False
+                self._pending += 1
+        if full:
+            logger.warning("Too many results being spilled; further pages dropped")
+            cursor.close()
+            return None
+
+        result_id = uuid.uuid4().hex
+        entry = {
+            "session_id": session_id,
+            "columns": list(columns),
+            "page_size": page_size,
+            "path": os.path.join(self._spill_dir(), f"{result_id}.pages"),
+            "pages": [],  # (offset, length) of each spilled page
+            "rows": 0,
+            "done": False,
+            "capped": False,
+            "error": None,
+            "cancelled": False,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._entries[result_id] = entry
+        self._publish(result_id, entry)
+
+        self.executor.submit(self._spill, result_id, entry, cursor)
+        return result_id
+
+    def _spill(self, result_id: str, entry: dict, cursor: OpenCursor):
+        page_size = entry["page_size"]
+        published = time.monotonic()
+        try:
+            with open(entry["path"], "wb") as f:
+                buffered = list(cursor.pending_rows)
+                while not entry["cancelled"]:
+                    if len(buffered) < page_size:
+                        more = cursor.result.fetchmany(page_size)
+                        buffered.extend(tuple(row) for row in more)
+                        if more and len(buffered) < page_size:
+                            continue
+
+                    page, buffered = buffered[:page_size], buffered[page_size:]
+                    if not page:
+                        break
+
+                    data = pickle.dumps(page, protocol=pickle.HIGHEST_PROTOCOL)
+                    offset = f.tell()
+                    f.write(data)
+                    f.flush()
+                    entry["pages"].append((offset, len(data)))
+                    entry["rows"] += len(page)
+
+                    if time.monotonic() - published >= RESULT_PUBLISH_SECONDS:
+                        self._publish(result_id, entry)
+                        published = time.monotonic()
+
+                    if entry["rows"] >= RESULT_SPILL_MAX_ROWS:
+                        entry["capped"] = True
+                        break
+        except Exception as e:
+            logger.error(f"Spilling result failed: {e}")
+            entry["error"] = str(e)
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+            with self._lock:
+                self._pending -= 1
+                entry["done"] = True
+                remove = entry["cancelled"]
+            # Dropped while spilling: the file is no longer anyone's
+            if remove:
+                self._remove(entry)
+            else:
+                self._publish(result_id, entry)
+
+    def get(self, result_id: str):
+        """
+        The entry of a result spilled by this worker, or a snapshot of one
+        from the shared index (blocking), or None. Entries past the TTL are
+        None even before they are purged (e.g. left by a worker that died).
+        """
+        entry = self._entries.get(result_id)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get_result(result_id)
+        if entry is not None and self._expired(entry, time.time()):
+            return None
+        return entry
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return bool(self.ttl_seconds) and entry["created_at"] < now - self.ttl_seconds
+
+    def read_page(self, entry: dict, page: int):
+        """
+        Rows of spilled page (1-based; page 0 was returned with the answer).
+        Returns None while the page is not spilled yet.
+        """
+        index = page - 1
+        if index >= len(entry["pages"]):
+            return None
+        offset, length = entry["pages"][index]
+        with open(entry["path"], "rb") as f:
+            f.seek(offset)
+            return pickle.loads(f.read(length))
+
+    def drop(self, result_id: str):
+        with self._lock:
+            entry = self._entries.pop(result_id, None)
+            if entry is None:
+                return
+            entry["cancelled"] = True
+            remove = entry["done"]
+        if self.shared is not None:
+            try:
+                self.shared.delete_result(result_id)
+            except Exception as e:
+                logger.error(f"Unpublishing result {result_id} failed: {e}")
+        # Otherwise the spill thread removes the file once it stops
+        if remove:
+            self._remove(entry)
+
+    @staticmethod
+    def _remove(entry: dict):
+        try:
+            os.remove(entry["path"])
+        except OSError:
+            pass
+
+    def drop_session(self, session_id: str):
+        for result_id in [
+            rid for rid, e in list(self._entries.items()) if e["session_id"] == session_id
+        ]:
+            self.drop(result_id)
+
+    def purge_expired(self):
+        """
+        Drop results past the TTL: this worker's, and in the shared index
+        those of any worker (their owner may be gone)
+        """
+        if not self.ttl_seconds:
+            return
+        now = time.time()
+        for result_id in [
+            rid for rid, e in list(self._entries.items()) if self._expired(e, now)
+        ]:
+            self.drop(result_id)
+
+        if self.shared is None:
+            return
+        try:
+            expired = self.shared.expired_results(now - self.ttl_seconds)
+            for result_id, record in expired:
+                if result_id not in self._entries:
+                    self.shared.delete_result(result_id)
+                    self._remove(record)
+        except Exception as e:
+            logger.error(f"Purging shared results failed: {e}")
+
+    def close(self):
+        for result_id in list(self._entries):
+            self.drop(result_id)
+        self.executor.shutdown(wait=False)
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
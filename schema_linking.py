@@ -0,0 +1,256 @@
+from collections import Counter
+import logging
+import math
+import os
+import re
+
+logger = logging.getLogger("schema_linking")
+
+SCHEMA_LINK_ENABLED = os.getenv("SCHEMA_LINK_ENABLED", "true").lower() == "true"
+SCHEMA_LINK_TOP_K = int(os.getenv("SCHEMA_LINK_TOP_K", "5"))
+# Below this best-table score the question is not linked confidently enough
+SCHEMA_LINK_MIN_SCORE = float(os.getenv("SCHEMA_LINK_MIN_SCORE", "1.0"))
+# Wider tables are rendered with only their key and relevant columns
+SCHEMA_LINK_MAX_COLUMNS = int(os.getenv("SCHEMA_LINK_MAX_COLUMNS", "30"))
+
+# Relative weight of a token depending on where it appears in the schema
+TABLE_NAME_WEIGHT = 3.0
+COLUMN_NAME_WEIGHT = 2.0
+COMMENT_WEIGHT = 1.0
+SAMPLE_VALUE_WEIGHT = 0.5
+
+# Words that signal the question needs rephrasing before SQL generation
+VAGUE_WORDS = {
+    "recent", "recently", "latest", "best", "worst", "popular", "good", "bad",
+    "important", "active", "interesting", "typical", "similar", "lately", "stuff",
+    "thing", "anything", "something",
+}
+
+STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "as", "at", "be", "by", "can", "do",
+    "does", "each", "for", "from", "get", "give", "has", "have", "how", "i",
+    "in", "is", "it", "list", "many", "me", "much", "of", "on", "or", "per",
+    "please", "show", "than", "that", "the", "their", "them", "there", "these",
+    "this", "to", "was", "were", "what", "when", "where", "which", "who",
+    "with", "would", "you",
+}
+
+
+def _stem(token: str) -> str:
+    """Very light plural stripping so 'courses' matches 'course'"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Split text and identifiers (snake_case, camelCase) into stemmed tokens"""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(text))
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return [_stem(t) for t in tokens if t not in STOPWORDS and len(t) > 1]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _sample_value_tokens(table_info: str) -> list:
+    """Tokens from the sample rows block SQLDatabase appends to each table"""
+    m = re.search(r"/\*(.*?)\*/", table_info, re.DOTALL)
+    if not m:
+        return []
+    # Skip the "N rows from X table:" title and the column header line
+    lines = m.group(1).strip().splitlines()[2:]
+    return tokenize(" ".join(lines))[:200]
+
+
+def build_link_index(db, table_infos: dict) -> dict:
+    """
+    Build the schema-linking index from reflected metadata (blocking, part of
+    the schema snapshot). Plain dicts/lists only so the snapshot stays
+    serializable.
+    """
+    tables = {}
+
+    for table in db._metadata.sorted_tables:
+        if table.name not in table_infos:
+            continue
+
+        weights = Counter()
+        for token in tokenize(table.name):
+            weights[token] += TABLE_NAME_WEIGHT
+        for token in tokenize(table.comment or ""):
+            weights[token] += COMMENT_WEIGHT
+
+        columns = {}
+        for column in table.columns:
+            try:
+                column_type = str(column.type)
+            except Exception:
+                column_type = "NULL"
+
+            column_tokens = tokenize(column.name) + tokenize(column.comment or "")
+            for token in tokenize(column.name):
+                weights[token] += COLUMN_NAME_WEIGHT
+            for token in tokenize(column.comment or ""):
+                weights[token] += COMMENT_WEIGHT
+
+            columns[column.name] = {"type": column_type, "tokens": column_tokens}
+
+        for token in _sample_value_tokens(table_infos[table.name]):
+            weights[token] += SAMPLE_VALUE_WEIGHT
+
+        tables[table.name] = {
+            "columns": columns,
+            "primary_keys": [c.name for c in table.primary_key.columns],
+            "foreign_keys": [
+                [fk.parent.name, fk.column.table.name, fk.column.name]
+                for fk in table.foreign_keys
+            ],
+            "weights": dict(weights),
+        }
+
+    document_frequency = Counter()
+    for entry in tables.values():
+        document_frequency.update(entry["weights"].keys())
+
+    return {"tables": tables, "df": dict(document_frequency)}
+
+
+def _score_tables(index: dict, question_tokens: list) -> dict:
+    n_tables = len(index["tables"])
+    scores = {}
+
+    for name, entry in index["tables"].items():
+        score = 0.0
+        for token in question_tokens:
+            weight = entry["weights"].get(token)
+            if weight:
+                df = index["df"].get(token, 0)
+                idf = math.log(1 + (n_tables - df + 0.5) / (df + 0.5))
+                score += idf * (1 + math.log(weight))
+        scores[name] = score
+
+    return scores
+
+
+def _compact_table_info(name: str, entry: dict, question_tokens: set) -> str:
+    """CREATE TABLE text with only key columns and columns matching the question"""
+    keys = set(entry["primary_keys"]) | {fk[0] for fk in entry["foreign_keys"]}
+
+    ranked = sorted(
+        entry["columns"].items(),
+        key=lambda item: -len(question_tokens.intersection(item[1]["tokens"])),
+    )
+    keep = [
+        col
+        for col, info in ranked
+        if col in keys or question_tokens.intersection(info["tokens"])
+    ][:SCHEMA_LINK_MAX_COLUMNS]
+
+    lines = [
+        f"\t{col} {entry['columns'][col]['type']}"
+        for col in entry["columns"]
+        if col in keep
+    ]
+    omitted = len(entry["columns"]) - len(lines)
+
+    text = f"CREATE TABLE {name} (\n" + ",\n".join(lines) + "\n)"
+    if omitted:
+        text += f"\n/* {omitted} columns not relevant to the question omitted */"
+    return text
+
+
+def link_schema(snapshot: dict, question: str, top_k: int = None) -> dict:
+    """
+    Pick the tables (and, for wide tables, columns) relevant to a question.
+
+    Returns the pruned table_info together with the selected tables, token
+    estimates and whether the full schema was used as a fallback.
+    """
+    full_info = snapshot["table_info"]
+    full_tokens = estimate_tokens(full_info)
+    top_k = top_k or SCHEMA_LINK_TOP_K
+    index = snapshot.get("link_index")
+
+    result = {
+        "table_info": full_info,
+        "tables": list(snapshot["table_names"]),
+        "tokens_full": full_tokens,
+        "tokens_used": full_tokens,
+        "tokens_saved": 0,
+        "fallback": True,
+    }
+
+    if not SCHEMA_LINK_ENABLED or not index:
+        return result
+
+    question_tokens = tokenize(question)
+    scores = _score_tables(index, question_tokens)
+    ranked = [name for name, score in sorted(scores.items(), key=lambda i: -i[1])]
+
+    if not ranked or scores[ranked[0]] < SCHEMA_LINK_MIN_SCORE:
+        logger.info("Schema linking confidence too low, using full schema")
+        return result
+
+    selected = [name for name in ranked[:top_k] if scores[name] > 0]
+
+    # Pull in bridge tables whose foreign keys join two selected tables
+    for name, entry in index["tables"].items():
+        if name in selected:
+            continue
+        targets = {fk[1] for fk in entry["foreign_keys"]}
+        if len(targets.intersection(selected)) >= 2:
+            selected.append(name)
+
+    question_token_set = set(question_tokens)
+    chunks = []
+    for name in snapshot["table_infos"]:
+        if name not in selected:
+            continue
+        entry = index["tables"].get(name)
+        if entry and len(entry["columns"]) > SCHEMA_LINK_MAX_COLUMNS:
+            chunks.append(_compact_table_info(name, entry, question_token_set))
+        else:
+            chunks.append(snapshot["table_infos"][name])
+
+    table_info = "\n\n".join(chunks)
+    used_tokens = estimate_tokens(table_info)
+
+    result.update(
+        table_info=table_info,
+        tables=selected,
+        tokens_used=used_tokens,
+        tokens_saved=max(0, full_tokens - used_tokens),
+        fallback=False,
+    )
+    return result
+
+
+def is_explicit_question(index: dict, question: str) -> bool:
+    """
+    True when a question already names a table plus a column or aggregate and
+    uses no vague wording, so rephrasing it would not help SQL generation.
+    """
+    if not index:
+        return False
+
+    raw_words = set(re.findall(r"[a-z]+", question.lower()))
+    if raw_words & VAGUE_WORDS:
+        return False
+
+    tokens = set(tokenize(question))
+    table_tokens, column_tokens = set(), set()
+    for name, entry in index["tables"].items():
+        table_tokens.update(tokenize(name))
+        for column in entry["columns"].values():
+            column_tokens.update(column["tokens"])
+
+    # student_id names the student table, not a column the question asks for
+    column_tokens -= table_tokens
+
+    aggregates = {"count", "total", "sum", "average", "avg", "max", "min", "number"}
+    return bool(tokens & table_tokens) and bool(tokens & (column_tokens | aggregates))
@@ -0,0 +1,109 @@
+from query_execution import run_db
+from schema_linking import build_link_index
+from utils import build_column_index
+import hashlib
+import logging
+import json
+import asyncio
+import time
+import os
+
+logger = logging.getLogger("schema_snapshot")
+
+# Snapshots older than this are refreshed in the background (0 disables the TTL)
+SCHEMA_TTL_SECONDS = float(os.getenv("SCHEMA_TTL_SECONDS", "3600"))
+
+# Background refreshes in flight (the event loop only keeps weak references)
+_refresh_tasks = set()
+
+
+def schema_fingerprint(column_types: dict) -> str:
+    """Hash of table names, column names and types; sample rows don't count"""
+    canonical = json.dumps(
+        {table: sorted(columns) for table, columns in column_types.items()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def build_schema_snapshot(db) -> dict:
+    """
+    Reflect the session schema once (blocking, call through run_db).
+
+    Returns a dict with the per-table CREATE/sample-row text, the joined
+    table_info used in prompts, a table -> columns map with its lookup index
+    for SQL validation, the schema-linking index and a fingerprint that
+    changes whenever a table, column or column type changes (not when only
+    the sample rows do).
+    """
+    table_names = list(db.get_usable_table_names())
+
+    table_infos = {}
+    for table in table_names:
+        table_infos[table] = db.get_table_info([table])
+
+    columns = {}
+    column_types = {}
+    for table in db._metadata.sorted_tables:
+        if table.name in table_infos:
+            columns[table.name] = [column.name for column in table.columns]
+            column_types[table.name] = [
+                [column.name, str(column.type)] for column in table.columns
+            ]
+
+    table_info = "\n\n".join(table_infos.values())
+
+    return {
+        "table_names": table_names,
+        "table_infos": table_infos,
+        "table_info": table_info,
+        "columns": columns,
+        "column_index": build_column_index(columns),
+        "link_index": build_link_index(db, table_infos),
+        "fingerprint": schema_fingerprint(column_types),
+        "built_at": time.time(),
+    }
+
+
+async def refresh_schema(session_data: dict) -> dict:
+    """Rebuild the snapshot for a session and store it"""
+    snapshot = await run_db(build_schema_snapshot, session_data["db"])
+    session_data["schema"] = snapshot
+    session_data["table_names"] = snapshot["table_names"]
+    return snapshot
+
+
+async def _background_refresh(session_data: dict, save=None):
+    try:
+        await refresh_schema(session_data)
+        if save is not None:
+            await asyncio.to_thread(save)
+    except Exception as e:
+        logger.error(f"Schema refresh failed: {e}")
+    finally:
+        session_data.pop("schema_refreshing", None)
+
+
+def get_schema(session_data: dict, save=None) -> dict:
+    """
+    Return the cached snapshot without touching the database.
+
+    When the TTL has expired the current snapshot is still served and a
+    refresh is scheduled in the background; save (blocking, e.g. the session
+    store's save for this session) then shares the new snapshot.
+    """
+    snapshot = session_data["schema"]
+
+    expired = (
+        SCHEMA_TTL_SECONDS > 0
+        and time.time() - snapshot["built_at"] > SCHEMA_TTL_SECONDS
+    )
+    if expired and not session_data.get("schema_refreshing"):
+        session_data["schema_refreshing"] = True
+        task = asyncio.get_running_loop().create_task(
+            _background_refresh(session_data, save)
+        )
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    return snapshot
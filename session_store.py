@@ -0,0 +1,519 @@
+from collections import OrderedDict
+import threading
+import logging
+import asyncio
+import sqlite3
+import json
+import time
+import uuid
+import os
+
+logger = logging.getLogger("session_store")
+
+# Sessions idle longer than this are reaped (0 = never)
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+# Beyond this many sessions (or this much estimated memory) the least recently
+# used ones are evicted (0 = unlimited)
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "256"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", "0"))
+SESSION_REAP_SECONDS = float(os.getenv("SESSION_REAP_SECONDS", "60"))
+
+# Where session configs and schema snapshots live: "memory" (this process
+# only) or "sqlite" (a file shared by every API worker on the host)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+# Shared last-used times are written at most this often per session
+SESSION_TOUCH_SECONDS = float(os.getenv("SESSION_TOUCH_SECONDS", "10"))
+
+
+def estimate_session_bytes(data: dict) -> int:
+    """
+    Rough memory held by a session: its schema snapshot (the engine is shared
+    and the reflected metadata is about the size of the snapshot again)
+    """
+    try:
+        schema_bytes = len(json.dumps(data.get("schema"), default=str))
+    except Exception:
+        schema_bytes = 0
+    return 2 * schema_bytes
+
+
+def _dump(model) -> dict:
+    dump = getattr(model, "model_dump", None) or model.dict
+    return dump()
+
+
+def session_record(data: dict) -> dict:
+    """
+    The serializable part of a session: everything needed to rebuild its
+    engine and reuse its schema snapshot in another worker. Note that the
+    config includes the database credentials.
+    """
+    return {
+        "config": _dump(data["config"]),
+        "db_type": data["db_type"],
+        "table_names": data["table_names"],
+        "schema": data["schema"],
+        "limits": _dump(data["limits"]),
+    }
+
+
+class MemorySessionBackend:
+    """Session records in this process (single worker)"""
+
+    shared = False
+
+    def __init__(self):
+        self._records = {}
+        self._versions = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None:
+                return None
+            return dict(record, version=self._versions[session_id])
+
+    def put(self, session_id: str, record: dict) -> str:
+        with self._lock:
+            version = self._versions[session_id] = uuid.uuid4().hex
+            self._records[session_id] = record
+            self._last_used[session_id] = time.time()
+        return version
+
+    def update(self, session_id: str, record: dict):
+        with self._lock:
+            if session_id not in self._records:
+                return None
+            version = self._versions[session_id] = uuid.uuid4().hex
+            self._records[session_id] = record
+        return version
+
+    def version(self, session_id: str):
+        return self._versions.get(session_id)
+
+    def touch(self, session_id: str):
+        with self._lock:
+            if session_id in self._records:
+                self._last_used[session_id] = time.time()
+
+    def last_used(self, session_id: str):
+        return self._last_used.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            self._last_used.pop(session_id, None)
+            self._versions.pop(session_id, None)
+            return self._records.pop(session_id, None) is not None
+
+    def expired(self, cutoff: float) -> list:
+        with self._lock:
+            return [sid for sid, used in self._last_used.items() if used < cutoff]
+
+    def items(self) -> list:
+        with self._lock:
+            return list(self._records.items())
+
+    def count(self) -> int:
+        return len(self._records)
+
+
+class SQLiteSessionBackend:
+    """
+    Session records in a SQLite file, so every API worker on the host sees
+    the same sessions. The file holds database credentials and is created
+    readable by its owner only. It also indexes the spilled pages of
+    truncated results (see ResultStore.share) for the same reason.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = SESSION_DB_PATH):
+        self.path = path
+        if not os.path.exists(path):
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, record TEXT NOT NULL, last_used REAL NOT NULL, "
+                "version TEXT NOT NULL DEFAULT '')"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+            if "version" not in columns:  # file from before versioned records
+                self._conn.execute(
+                    "ALTER TABLE sessions ADD COLUMN version TEXT NOT NULL DEFAULT ''"
+                )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "id TEXT PRIMARY KEY, record TEXT NOT NULL)"
+            )
+
+    def get(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record, version FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return dict(json.loads(row[0]), version=row[1]) if row else None
+
+    def put(self, session_id: str, record: dict) -> str:
+        version = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, record, last_used, version) "
+                "VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(record, default=str), time.time(), version),
+            )
+        return version
+
+    def update(self, session_id: str, record: dict):
+        version = uuid.uuid4().hex
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE sessions SET record = ?, version = ? WHERE id = ?",
+                (json.dumps(record, default=str), version, session_id),
+            )
+        return version if cursor.rowcount > 0 else None
+
+    def version(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def touch(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET last_used = ? WHERE id = ?",
+                (time.time(), session_id),
+            )
+
+    def last_used(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_used FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE id = ?", (session_id,)
+            )
+        return cursor.rowcount > 0
+
+    def expired(self, cutoff: float) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM sessions WHERE last_used < ?", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self) -> list:
+        with self._lock:
+            rows = self._conn.execute("SELECT id, record FROM sessions").fetchall()
+        return [(sid, json.loads(record)) for sid, record in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def put_result(self, result_id: str, record: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (id, record) VALUES (?, ?)",
+                (result_id, json.dumps(record, default=str)),
+            )
+
+    def get_result(self, result_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM results WHERE id = ?", (result_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_result(self, result_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+
+    def expired_results(self, cutoff: float) -> list:
+        """(result_id, record) of results created before cutoff"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, record FROM results "
+                "WHERE json_extract(record, '$.created_at') < ?",
+                (cutoff,),
+            ).fetchall()
+        return [(rid, json.loads(record)) for rid, record in rows]
+
+
+def make_session_backend(kind: str = None):
+    kind = (kind or SESSION_BACKEND).lower()
+    if kind == "sqlite":
+        return SQLiteSessionBackend(SESSION_DB_PATH)
+    if kind == "memory":
+        return MemorySessionBackend()
+    raise ValueError(f"Unsupported SESSION_BACKEND: {kind}")
+
+
+class SessionStore:
+    """
+    Sessions by id. Records (config, schema snapshot, limits) live in a
+    backend shared by all API workers; each worker keeps the sessions it
+    serves live (with their engine) in LRU order and rebuilds others lazily
+    from their record.
+
+    Sessions idle for more than ttl_seconds are reaped everywhere. Past
+    max_sessions / max_bytes the least recently used live sessions of this
+    worker are evicted: unloaded and their record deleted, so the limits
+    bound the backend as well. on_evict(session_id, data) releases a live
+    session's resources.
+    """
+
+    def __init__(
+        self,
+        on_evict=None,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX_COUNT,
+        max_bytes: int = SESSION_MAX_BYTES,
+        backend=None,
+    ):
+        self.on_evict = on_evict
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.backend = backend or make_session_backend()
+        self._data = OrderedDict()  # live sessions: session_id -> session dict
+        self._last_used = {}
+        self._touched = {}  # when the backend last_used was last written
+        self._sizes = {}  # session_id -> (schema fingerprint, bytes)
+        self._versions = {}  # version of the record each live session was built from
+        self._lock = threading.RLock()
+        self.expired = 0
+        self.evicted = 0
+        self._reaper = None
+
+    # Methods that reach the backend block (SQLite) and may release evicted
+    # sessions' engines: call them through asyncio.to_thread. get() only
+    # reads live sessions and leaves its backend write to a thread.
+
+    def count(self) -> int:
+        """Sessions in the backend, across all workers"""
+        return self.backend.count()
+
+    def add(self, session_id: str, data: dict):
+        """Store a new or reconnected session and share its record"""
+        version = self.backend.put(session_id, session_record(data))
+        self.attach(session_id, data, version)
+
+    def attach(self, session_id: str, data: dict, version: str = None):
+        """Make a session live in this worker (rebuilt from its record)"""
+        with self._lock:
+            self._data[session_id] = data
+            self._versions[session_id] = version
+            self._data.move_to_end(session_id)
+            self._last_used[session_id] = self._touched[session_id] = time.time()
+            self._sizes.pop(session_id, None)
+            self._enforce_limits(keep=session_id)
+
+    def get(self, session_id: str, default=None):
+        """Live session data in this worker (marks it as used), or default"""
+        with self._lock:
+            data = self._data.get(session_id)
+            if data is None:
+                return default
+            self._data.move_to_end(session_id)
+            now = self._last_used[session_id] = time.time()
+            touch = now - self._touched.get(session_id, 0) > SESSION_TOUCH_SECONDS
+            if touch:
+                self._touched[session_id] = now
+        if touch:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._touch(session_id)
+            else:
+                loop.run_in_executor(None, self._touch, session_id)
+        return data
+
+    def _touch(self, session_id: str):
+        try:
+            self.backend.touch(session_id)
+        except Exception as e:
+            logger.error(f"Updating last use of session {session_id} failed: {e}")
+
+    def load(self, session_id: str):
+        """The shared record of a session, or None if it does not exist"""
+        return self.backend.get(session_id)
+
+    def is_current(self, session_id: str) -> bool:
+        """
+        Whether a live session still matches its shared record. A session
+        deleted or reconnected by another worker is unloaded here, so the
+        caller rebuilds it from the new record (or finds it gone).
+        """
+        if not self.backend.shared:
+            return session_id in self._data
+        version = self.backend.version(session_id)
+        if version is not None and version == self._versions.get(session_id):
+            return True
+        self._unload(session_id)
+        return False
+
+    def save(self, session_id: str) -> bool:
+        """
+        Share a live session's updated record (e.g. a refreshed schema).
+        Never recreates a record deleted meanwhile: the session is unloaded
+        and False returned instead.
+        """
+        data = self._data.get(session_id)
+        if data is None:
+            return False
+        version = self.backend.update(session_id, session_record(data))
+        if version is None:
+            self._unload(session_id)
+            return False
+        with self._lock:
+            if session_id in self._data:
+                self._versions[session_id] = version
+        return True
+
+    def _unload(self, session_id: str):
+        with self._lock:
+            self._versions.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+            self._touched.pop(session_id, None)
+            self._sizes.pop(session_id, None)
+            data = self._data.pop(session_id, None)
+        if data is not None and self.on_evict is not None:
+            try:
+                self.on_evict(session_id, data)
+            except Exception as e:
+                logger.error(f"Releasing session {session_id} failed: {e}")
+
+    def pop(self, session_id: str, *default):
+        """
+        Delete a session everywhere. The live data of this worker is returned
+        without calling on_evict (the caller releases it).
+        """
+        existed = self.backend.delete(session_id)
+        with self._lock:
+            self._versions.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+            self._touched.pop(session_id, None)
+            self._sizes.pop(session_id, None)
+            data = self._data.pop(session_id, None)
+        if data is not None:
+            return data
+        if existed:
+            return {}
+        if default:
+            return default[0]
+        raise KeyError(session_id)
+
+    def items(self):
+        """(session_id, record) of every shared session; does not mark them used"""
+        return self.backend.items()
+
+    def session_bytes(self, session_id: str) -> int:
+        """Memory estimate of a live session, recomputed when its schema changes"""
+        data = self._data.get(session_id)
+        if data is None:
+            return 0
+        fingerprint = (data.get("schema") or {}).get("fingerprint")
+        cached = self._sizes.get(session_id)
+        if cached is None or cached[0] != fingerprint:
+            cached = (fingerprint, estimate_session_bytes(data))
+            self._sizes[session_id] = cached
+        return cached[1]
+
+    def total_bytes(self) -> int:
+        return sum(self.session_bytes(sid) for sid in list(self._data))
+
+    def idle_seconds(self, session_id: str) -> float:
+        last_used = self._last_used.get(session_id) or self.backend.last_used(
+            session_id
+        )
+        return time.time() - (last_used or time.time())
+
+    def _evict(self, session_id: str):
+        self.backend.delete(session_id)
+        self._unload(session_id)
+        self.evicted += 1
+
+    def _enforce_limits(self, keep: str = None):
+        with self._lock:
+            while self.max_sessions and len(self._data) > self.max_sessions:
+                victim = next(iter(self._data))
+                if victim == keep:
+                    break
+                logger.info(f"Evicting least recently used session {victim}")
+                self._evict(victim)
+
+            while self.max_bytes and len(self._data) > 1 and (
+                self.total_bytes() > self.max_bytes
+            ):
+                victim = next(iter(self._data))
+                if victim == keep:
+                    break
+                logger.info(f"Evicting session {victim} to fit the memory budget")
+                self._evict(victim)
+
+    def reap(self) -> int:
+        """
+        Delete sessions idle past the TTL and unload the ones this worker has
+        not used for that long; returns how many were deleted
+        """
+        if not self.ttl_seconds:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+
+        expired = self.backend.expired(cutoff)
+        for session_id in expired:
+            logger.info(f"Reaping idle session {session_id}")
+            self.backend.delete(session_id)
+            self._unload(session_id)
+        self.expired += len(expired)
+
+        with self._lock:
+            idle = [sid for sid, used in self._last_used.items() if used < cutoff]
+        for session_id in idle:
+            self._unload(session_id)
+
+        return len(expired)
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(SESSION_REAP_SECONDS)
+            try:
+                # on_evict may dispose engines, keep that off the event loop
+                await asyncio.to_thread(self.reap)
+            except Exception as e:
+                logger.error(f"Session reaper failed: {e}")
+
+    def start_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    def stop_reaper(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "sessions": self.count(),
+            "live_sessions": len(self._data),
+            "max_sessions": self.max_sessions or None,
+            "ttl_seconds": self.ttl_seconds or None,
+            "bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes or None,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
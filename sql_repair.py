@@ -0,0 +1,192 @@
+from sqlglot.optimizer.scope import traverse_scope
+from utils import SQLGLOT_DIALECTS, scope_columns, scope_tables, is_outer_column
+from sqlglot import exp
+import threading
+import difflib
+import logging
+import sqlglot
+import os
+import re
+
+logger = logging.getLogger("sql_repair")
+
+SQL_REPAIR_ENABLED = os.getenv("SQL_REPAIR_ENABLED", "true").lower() == "true"
+# difflib ratio a misspelled identifier needs to be replaced by a schema name
+SQL_REPAIR_CUTOFF = float(os.getenv("SQL_REPAIR_CUTOFF", "0.8"))
+# Rule-based passes per query before falling back to the model
+SQL_REPAIR_MAX_PASSES = int(os.getenv("SQL_REPAIR_MAX_PASSES", "2"))
+
+# Dialects without LIMIT; sqlglot parses it and renders TOP / FETCH FIRST
+LIMIT_REWRITE_DIALECTS = {"tsql", "oracle"}
+
+_stats = {"attempts": 0, "repaired": 0, "saved": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def record_saved():
+    """A repaired query executed, so a model correction call was avoided"""
+    _count("saved")
+
+
+def repair_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _closest(name: str, candidates) -> str:
+    matches = difflib.get_close_matches(
+        name.lower(), list(candidates), n=2, cutoff=SQL_REPAIR_CUTOFF
+    )
+    if not matches:
+        return None
+    if len(matches) > 1:
+        first = difflib.SequenceMatcher(None, name.lower(), matches[0]).ratio()
+        second = difflib.SequenceMatcher(None, name.lower(), matches[1]).ratio()
+        if first == second:
+            return None  # ambiguous, leave it to the model
+    return matches[0]
+
+
+def _needs_quoting(name: str, dialect: str) -> bool:
+    """Schema names that unquoted identifiers would case-fold away from"""
+    if dialect == "postgres":
+        return name != name.lower()
+    if dialect == "oracle":
+        return name != name.upper()
+    return False
+
+
+def _set_identifier(node, real: str, dialect: str, fixes: list, what: str):
+    identifier = node.this
+    quote = _needs_quoting(real, dialect)
+    if identifier.name == real and (identifier.quoted or not quote):
+        return
+    if identifier.name.lower() != real.lower():
+        fixes.append(f"{what} '{identifier.name}' -> '{real}'")
+    elif quote:
+        fixes.append(f"quoted {what} '{real}'")
+    node.set("this", exp.to_identifier(real, quoted=quote or identifier.quoted))
+
+
+def _fix_tables(parsed, index: dict, dialect: str, fixes: list):
+    ctes = {cte.alias_or_name.lower() for cte in parsed.find_all(exp.CTE)}
+    renamed = {}
+
+    for table in list(parsed.find_all(exp.Table)):
+        name = table.name.lower()
+        if not name or table.args.get("db") or name in ctes:
+            continue
+        if name not in index:
+            match = _closest(name, index)
+            if match is None:
+                continue
+            if not table.alias:
+                renamed[name] = index[match]["name"]
+            name = match
+        _set_identifier(table, index[name]["name"], dialect, fixes, "table")
+
+    # Columns qualified with a misspelled (unaliased) table name follow it
+    for column in parsed.find_all(exp.Column):
+        real = renamed.get(column.table.lower())
+        if real is not None:
+            column.set("table", exp.to_identifier(real, quoted=_needs_quoting(real, dialect)))
+
+
+def _fix_columns(parsed, index: dict, dialect: str, fixes: list):
+    for scope in traverse_scope(parsed):
+        tables, opaque = scope_tables(scope, index)
+
+        aliases = set()
+        if isinstance(scope.expression, exp.Select):
+            aliases = {s.alias.lower() for s in scope.expression.selects if s.alias}
+
+        for column in scope_columns(scope):
+            if isinstance(column.this, exp.Star):
+                continue
+            name = column.name.lower()
+            qualifier = column.table.lower()
+
+            if qualifier:
+                if qualifier not in tables:
+                    continue
+                candidates = [tables[qualifier]]
+            elif opaque or name in aliases:
+                continue
+            else:
+                candidates = list(tables.values())
+
+            owners = [t for t in candidates if name in index[t]["columns"]]
+            if not owners and not qualifier and is_outer_column(scope, index, name):
+                continue  # correlated reference, not a typo of a local column
+            if not owners:
+                matches = {}
+                for table in candidates:
+                    match = _closest(name, index[table]["columns"])
+                    if match is not None:
+                        matches[table] = match
+                if len(set(matches.values())) != 1:
+                    continue  # nothing close, or close to several columns
+                owners = list(matches)
+                name = next(iter(matches.values()))
+            if len(owners) == 1:
+                real = index[owners[0]]["columns"][name]
+                _set_identifier(column, real, dialect, fixes, "column")
+
+
+def repair_sql(query: str, db_type: str = "", schema_index: dict = None):
+    """
+    Rule-based fixes for mechanical SQL mistakes, tried before asking the
+    model: escaped quotes from model output, LIMIT/TOP syntax of the wrong
+    dialect, near-miss table and column names (difflib against the schema
+    index) and case-sensitive identifiers that need quoting on PostgreSQL
+    and Oracle.
+
+    Returns (repaired_query, fixes), or (None, []) when no rule applies.
+    """
+    if not SQL_REPAIR_ENABLED:
+        return None, []
+
+    _count("attempts")
+    dialect = SQLGLOT_DIALECTS.get(db_type.lower())
+    fixes = []
+
+    text = query.replace('\\"', '"').replace("\\'", "'").strip()
+    if text != query.strip():
+        fixes.append("unescaped quotes")
+
+    parsed = None
+    try:
+        parsed = sqlglot.parse_one(text, read=dialect)
+        if dialect in LIMIT_REWRITE_DIALECTS and re.search(r"(?i)\bLIMIT\b", text):
+            fixes.append(f"LIMIT rewritten for {dialect}")
+    except Exception:
+        # Often another dialect's row limit syntax (e.g. TOP outside SQL Server)
+        for source in (None, "tsql"):
+            try:
+                parsed = sqlglot.parse_one(text, read=source)
+                fixes.append(f"transpiled to {dialect} syntax")
+                break
+            except Exception:
+                continue
+
+    if parsed is None:
+        return (text, fixes) if fixes else (None, [])
+
+    if schema_index:
+        try:
+            _fix_tables(parsed, schema_index, dialect, fixes)
+            _fix_columns(parsed, schema_index, dialect, fixes)
+        except Exception as e:
+            logger.debug(f"Identifier repair skipped: {e}")
+
+    if not fixes:
+        return None, []
+
+    _count("repaired")
+    logger.info(f"Repaired SQL without the model: {', '.join(fixes)}")
+    return parsed.sql(dialect=dialect), fixes
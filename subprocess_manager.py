@@ -2,63 +2,285 @@
 import subprocess
 import os
 import time
-import requests
+import json
 import logging
 import signal
+import threading
+from collections import OrderedDict
+from utils import model_server_health, model_server_socket, stop_ollama
 
 logger = logging.getLogger("subprocess_manager")
 
-_server = None
-_port = 8001
-
-def start_model_server(model_type: str, model_path: str = "", port: int = 8001):
-    global _server, _port
-    stop_model_server()  # stop existing
-
-    env = os.environ.copy()
-    env["MODEL_TYPE"] = model_type
-    if model_path:
-        env["MODEL_PATH"] = model_path
-    cmd = [
-        "uvicorn",
-        "model_server:app",
-        "--host", "127.0.0.1",
-        "--port", str(port),
-        "--log-level", "error"
-    ]
-
-    logger.info(f"Starting model subprocess with MODEL_TYPE={model_type}")
-    _server = subprocess.Popen(cmd, env=env, stdout=None, stderr=None)
-    _port = port
-
-    # wait until server responds
-    for _ in range(30):
-        try:
-            r = requests.get(f"http://127.0.0.1:{port}/docs", timeout=1)
-            if r.status_code == 200:
+MODEL_BASE_PORT = int(os.getenv("MODEL_BASE_PORT", "8001"))
+MODEL_STARTUP_TIMEOUT = float(os.getenv("MODEL_STARTUP_TIMEOUT", "120"))
+MODEL_HEARTBEAT_SECONDS = float(os.getenv("MODEL_HEARTBEAT_SECONDS", "5"))
+# Total memory the warm backends may use (0 = unlimited) and idle eviction
+MODEL_POOL_MEMORY_MB = float(os.getenv("MODEL_POOL_MEMORY_MB", "0"))
+MODEL_POOL_IDLE_SECONDS = float(os.getenv("MODEL_POOL_IDLE_SECONDS", "0"))
+
+# Each backend gets its own port so several can stay warm at once
+BACKEND_PORT_OFFSETS = {"Local Text2SQL": 0, "OpenAi": 1, "Mistral": 2, "Stub": 3}
+
+# Expected resident memory per backend; the larger of this and the measured
+# RSS counts against the budget (Mistral's weights live in the Ollama process)
+BACKEND_MEMORY_MB = {"Local Text2SQL": 6000, "Mistral": 5000, "OpenAi": 300, "Stub": 150}
+BACKEND_MEMORY_MB.update(json.loads(os.getenv("MODEL_MEMORY_ESTIMATES_MB", "{}")))
+
+# model_type -> {"process", "port", "last_used", "alive", "checked_at",
+# "external"}, LRU order. External servers were started by another API worker
+# on the backend's port and are shared, not owned (process is None)
+_pool = OrderedDict()
+_lock = threading.RLock()
+_heartbeat = None
+
+
+def backend_port(model_type: str) -> int:
+    return MODEL_BASE_PORT + BACKEND_PORT_OFFSETS.get(model_type, len(BACKEND_PORT_OFFSETS))
+
+
+def _process_rss_mb(pid: int) -> float:
+    """Resident memory of a process from /proc (0 where unavailable)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _backend_memory_mb(model_type: str, entry: dict = None) -> float:
+    estimate = BACKEND_MEMORY_MB.get(model_type, 0)
+    if entry is None:
+        return estimate
+    if entry["external"]:
+        return 0.0  # accounted for by the worker that owns it
+    return max(estimate, _process_rss_mb(entry["process"].pid))
+
+
+def _update_liveness(entry: dict, health):
+    entry["alive"] = bool(health and health.get("ready"))
+    entry["checked_at"] = time.time()
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(MODEL_HEARTBEAT_SECONDS)
+
+        with _lock:
+            entries = list(_pool.items())
+
+        for model_type, entry in entries:
+            if not entry["external"] and entry["process"].poll() is not None:
+                logger.warning(f"Model server for {model_type} exited")
+                with _lock:
+                    _pool.pop(model_type, None)
+                continue
+
+            idle = time.time() - entry["last_used"]
+            if MODEL_POOL_IDLE_SECONDS and idle > MODEL_POOL_IDLE_SECONDS:
+                logger.info(f"Evicting idle model server for {model_type}")
+                stop_model_server(model_type)
+                continue
+
+            health = model_server_health(entry["port"], timeout=1)
+            if entry["external"] and health is None:
+                # Its owner stopped it; the next request starts or adopts one
+                logger.warning(f"Shared model server for {model_type} went away")
+                with _lock:
+                    _pool.pop(model_type, None)
+                continue
+            _update_liveness(entry, health)
+
+
+def _ensure_heartbeat():
+    global _heartbeat
+    if _heartbeat is None or not _heartbeat.is_alive():
+        _heartbeat = threading.Thread(
+            target=_heartbeat_loop, name="model-heartbeat", daemon=True
+        )
+        _heartbeat.start()
+
+
+def is_model_server_alive(model_type: str) -> bool:
+    """Cached liveness of a pooled model server (no HTTP call)"""
+    entry = _pool.get(model_type)
+    if entry is None:
+        return False
+    if entry["external"]:
+        return entry["alive"]
+    if entry["process"].poll() is not None:
+        entry["alive"] = False
+        return False
+    return entry["alive"]
+
+
+def touch_model_server(model_type: str) -> int:
+    """Mark a backend as used (LRU) and return its port"""
+    with _lock:
+        entry = _pool[model_type]
+        entry["last_used"] = time.time()
+        _pool.move_to_end(model_type)
+        return entry["port"]
+
+
+def pool_memory_mb() -> float:
+    with _lock:
+        return sum(_backend_memory_mb(t, e) for t, e in _pool.items())
+
+
+def _make_room(model_type: str):
+    """Evict least recently used backends until model_type fits the budget"""
+    if not MODEL_POOL_MEMORY_MB:
+        return
+
+    needed = _backend_memory_mb(model_type)
+    while _pool and pool_memory_mb() + needed > MODEL_POOL_MEMORY_MB:
+        victim = next(iter(_pool))
+        logger.info(f"Evicting model server for {victim} to fit {model_type}")
+        stop_model_server(victim)
+
+
+def _adopt(model_type: str, port: int, health) -> bool:
+    """Use a ready server another API worker runs for model_type on port"""
+    if not (health and health.get("ready") and health.get("model_type") == model_type):
+        return False
+    logger.info(f"Sharing the model server for {model_type} on port {port}")
+    _pool[model_type] = {
+        "process": None,
+        "port": port,
+        "last_used": time.time(),
+        "alive": True,
+        "checked_at": time.time(),
+        "external": True,
+    }
+    _ensure_heartbeat()
+    return True
+
+
+def start_model_server(model_type: str, model_path: str = "", port: int = None) -> int:
+    """
+    Make sure a warm model server for model_type is running and return its
+    port. Other backends stay up unless the memory budget requires eviction.
+    Backends have fixed ports, so a server already started there by another
+    API worker is shared instead of starting a second one.
+    """
+    with _lock:
+        if is_model_server_alive(model_type):
+            return touch_model_server(model_type)
+
+        stop_model_server(model_type)  # dead or unready leftover
+        port = port or backend_port(model_type)
+
+        if _adopt(model_type, port, model_server_health(port, timeout=1)):
+            return port
+
+        _make_room(model_type)
+
+        env = os.environ.copy()
+        env["MODEL_TYPE"] = model_type
+        if model_path:
+            env["MODEL_PATH"] = model_path
+        cmd = [
+            "uvicorn",
+            "model_server:app",
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--log-level", "error"
+        ]
+        socket_path = model_server_socket(port)
+        if socket_path:
+            # uvicorn ignores host/port when binding a Unix socket
+            os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+            if os.path.exists(socket_path):
+                os.remove(socket_path)  # stale socket from a previous server
+            cmd += ["--uds", socket_path]
+
+        logger.info(f"Starting model subprocess with MODEL_TYPE={model_type} on port {port}")
+        process = subprocess.Popen(cmd, env=env, stdout=None, stderr=None)
+        entry = {
+            "process": process,
+            "port": port,
+            "last_used": time.time(),
+            "alive": False,
+            "checked_at": 0.0,
+            "external": False,
+        }
+        _pool[model_type] = entry
+
+    _ensure_heartbeat()
+
+    # wait until the model is loaded (uvicorn only answers after startup)
+    deadline = time.time() + MODEL_STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            # Lost a race for the port with another worker starting the same backend
+            with _lock:
+                if _adopt(model_type, port, model_server_health(port, timeout=1)):
+                    return port
+            logger.error(f"Model server exited with code {process.returncode}")
+            break
+        health = model_server_health(port, timeout=1)
+        if health is not None:
+            _update_liveness(entry, health)
+            if health.get("ready"):
                 logger.info("Model server ready!")
-                return
-        except:
-            time.sleep(0.2)
+            else:
+                logger.error("Model server is up but the model failed to load")
+            return port
+        time.sleep(0.2)
 
     logger.warning("Model server startup timeout")
+    return port
 
 
-def stop_model_server():
-    global _server
+def stop_model_server(model_type: str = None):
+    """Stop one pooled backend, or all of them when model_type is None"""
+    with _lock:
+        if model_type is None:
+            targets = list(_pool)
+        else:
+            targets = [model_type] if model_type in _pool else []
 
-    logger.info("--------------------")
-    logger.info("Stopping model subprocess")
-    logger.info("--------------------") 
+        for target in targets:
+            entry = _pool.pop(target)
+            if entry["external"]:
+                continue  # owned by another API worker, only stop using it
+            server = entry["process"]
 
-    if _server is None:
-        return
-    try:
-        _server.terminate()
-        _server.wait(3)
-    except:
-        try:
-            _server.kill()
-        except:
-            pass
-    _server = None
+            logger.info("--------------------")
+            logger.info(f"Stopping model subprocess for {target}")
+            logger.info("--------------------")
+
+            try:
+                server.terminate()
+                server.wait(3)
+            except:
+                try:
+                    server.kill()
+                except:
+                    pass
+
+            if target == "Mistral":
+                stop_ollama()  # the weights live in Ollama, free them too
+
+
+def model_server_status() -> dict:
+    with _lock:
+        backends = {
+            model_type: {
+                "port": entry["port"],
+                "alive": is_model_server_alive(model_type),
+                "idle_seconds": round(time.time() - entry["last_used"], 1),
+                "memory_mb": round(_backend_memory_mb(model_type, entry), 1),
+                "checked_at": entry["checked_at"],
+                "external": entry["external"],
+            }
+            for model_type, entry in _pool.items()
+        }
+    return {
+        "backends": backends,
+        "memory_mb": round(pool_memory_mb(), 1),
+        "memory_budget_mb": MODEL_POOL_MEMORY_MB or None,
+    }
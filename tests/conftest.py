@@ -0,0 +1,64 @@
+import asyncio
+import sys
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# main.py and model_server.py import the backends and connectors by module name
+for name in ("", "LLMs", "DB_connection", "benchmarks"):
+    path = os.path.join(ROOT, name) if name else ROOT
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fixture_db import build_fixture
+from utils import build_column_index
+
+# The frontend's default tables, as built by benchmarks/fixture_db.py
+SCHEMA = {
+    "students": ["student_id", "name", "email", "enrolled_on"],
+    "courses": ["course_id", "title", "department", "credits"],
+    "enrollments": ["enrollment_id", "student_id", "course_id", "enrolled_at", "grade"],
+}
+
+
+@pytest.fixture
+def column_index():
+    return build_column_index(SCHEMA)
+
+
+@pytest.fixture(scope="session")
+def fixture_db(tmp_path_factory):
+    """Path of a small SQLite fixture database (same seed every run)"""
+    path = str(tmp_path_factory.mktemp("db") / "fixture.db")
+    build_fixture(path, students=2000)
+    return path
+
+
+# Latency of every model call made through the slow_model fixture
+MODEL_LATENCY = 0.2
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    """
+    Route the API's model calls to StubLLM.respond, each taking
+    MODEL_LATENCY seconds like a remote backend; no model server is started.
+    Returns the StubLLM (set lower-cased question keys in its fixtures).
+    """
+    import main
+    from Stub import StubLLM
+
+    stub = StubLLM()
+
+    async def call_model(prompt: str, max_tokens: int = 1024):
+        await asyncio.sleep(MODEL_LATENCY)
+        return stub.respond(prompt)
+
+    async def ensure_model_runtime(model_type: str, model_path: str = ""):
+        pass
+
+    monkeypatch.setattr(main, "call_model", call_model)
+    monkeypatch.setattr(main, "ensure_model_runtime", ensure_model_runtime)
+    return stub
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+from batching import BatchScheduler
+
+
+class CountingChain:
+    """Fake chain that records how many callers are inside it at once"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        self._enter()
+        try:
+            time.sleep(0.02)
+            return [p.upper() for p in prompts]
+        finally:
+            self._leave()
+
+    def stream(self, prompt):
+        self._enter()
+        try:
+            for word in prompt.split():
+                time.sleep(0.01)
+                yield word
+        finally:
+            self._leave()
+
+
+async def _run(max_inflight):
+    chain = CountingChain()
+    scheduler = BatchScheduler(chain, window_ms=1, max_size=2, max_inflight=max_inflight)
+    scheduler.start()
+
+    async def collect(prompt):
+        return [chunk async for chunk in scheduler.stream(prompt)]
+
+    try:
+        results = await asyncio.gather(
+            *(collect("a b c") for _ in range(3)),
+            *(scheduler.submit(f"p{i}") for i in range(4)),
+        )
+    finally:
+        await scheduler.stop()
+    return chain, results
+
+
+def test_streams_share_the_inflight_limit():
+    chain, results = asyncio.run(_run(max_inflight=1))
+    assert chain.peak == 1
+    assert results[:3] == [["a", "b", "c"]] * 3
+    assert results[3:] == ["P0", "P1", "P2", "P3"]
+
+
+def test_abandoned_stream_releases_its_slot():
+    async def run():
+        chain = CountingChain()
+        scheduler = BatchScheduler(chain, window_ms=1, max_inflight=1)
+        scheduler.start()
+        stream = scheduler.stream("a b c d")
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+        out = await asyncio.wait_for(scheduler.submit("x"), 1)
+        await scheduler.stop()
+        return chain, out
+
+    chain, out = asyncio.run(run())
+    assert out == "X" and chain.active == 0
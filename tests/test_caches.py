@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from caches import (
+    LRUTTLCache,
+    QuestionSQLCache,
+    ResultCache,
+    estimate_rows_size,
+    normalize_question,
+)
+
+FINGERPRINT = "f" * 64
+
+
+def test_normalize_keeps_operators_numbers_and_literals():
+    assert normalize_question("courses with credits > 3") != normalize_question(
+        "courses with credits < 3"
+    )
+    assert normalize_question("credits >= 3") != normalize_question("credits > 3")
+    assert normalize_question("balance below -3") != normalize_question("balance below 3")
+    assert normalize_question("students named 'Smith'") != normalize_question(
+        "students named 'smith'"
+    )
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "  How many   STUDENTS are there? ",
+        "courses with credits >= 3",
+        "students named 'O Brien' enrolled after 2022-01-01",
+    ],
+)
+def test_normalize_is_idempotent(question):
+    once = normalize_question(question)
+    assert normalize_question(once) == once
+
+
+def test_normalize_ignores_case_spacing_and_punctuation():
+    assert normalize_question("How many students are there?") == normalize_question(
+        "how many  students are there"
+    )
+
+
+def test_operator_questions_do_not_share_an_entry():
+    cache = QuestionSQLCache(similarity=0)
+    cache.set("courses with credits > 3", FINGERPRINT, "sqlite", "Stub",
+              "SELECT * FROM courses WHERE credits > 3")
+    assert cache.get("courses with credits < 3", FINGERPRINT, "sqlite", "Stub") is None
+    hit = cache.get("Courses with credits > 3?", FINGERPRINT, "sqlite", "Stub")
+    assert hit["sql"] == "SELECT * FROM courses WHERE credits > 3"
+
+
+def test_fuzzy_match_requires_same_literals():
+    cache = QuestionSQLCache(similarity=0.5)
+    cache.set("show courses with credits > 3", FINGERPRINT, "sqlite", "Stub", "Q1")
+    assert cache.get("list courses with credits > 3", FINGERPRINT, "sqlite", "Stub")["sql"] == "Q1"
+    assert cache.get("list courses with credits < 3", FINGERPRINT, "sqlite", "Stub") is None
+    assert cache.get("list courses with credits > 4", FINGERPRINT, "sqlite", "Stub") is None
+
+
+def test_key_includes_fingerprint_and_model():
+    cache = QuestionSQLCache(similarity=0)
+    cache.set("how many students", FINGERPRINT, "sqlite", "Stub", "Q")
+    assert cache.get("how many students", "other", "sqlite", "Stub") is None
+    assert cache.get("how many students", FINGERPRINT, "sqlite", "OpenAi") is None
+
+
+def test_invalidate_with_stored_question():
+    cache = QuestionSQLCache(similarity=0)
+    cache.set("Credits > 3?", FINGERPRINT, "sqlite", "Stub", "Q")
+    entry = cache.get("credits > 3", FINGERPRINT, "sqlite", "Stub")
+    cache.invalidate(entry["question"], FINGERPRINT, "sqlite", "Stub")
+    assert cache.get("credits > 3", FINGERPRINT, "sqlite", "Stub") is None
+
+
+def test_lru_and_ttl_eviction():
+    cache = LRUTTLCache(max_entries=2, ttl_seconds=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None and cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_result_cache_memory_budget():
+    rows = [(i, "x" * 10) for i in range(20)]
+    size = estimate_rows_size(("id", "name"), rows)
+    cache = ResultCache(max_bytes=int(size * 1.5), max_entries=100, ttl_seconds=0)
+    cache.set(("scope",), "q1", ("id", "name"), rows)
+    cache.set(("scope",), "q2", ("id", "name"), rows)
+    assert cache.stats()["bytes"] <= size * 1.5
+    assert cache.get(("scope",), "q1") is None
+    assert cache.get(("scope",), "q2") is not None
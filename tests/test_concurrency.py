@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import httpx
+
+import main
+from pipeline_modes import DEFAULT_QUESTIONS
+
+
+async def _ask(client, session_id: str, question: str):
+    resp = await client.post(
+        "/ask-question",
+        json={
+            "session_id": session_id,
+            "question": question,
+            "used_model": {"model_type": "Stub"},
+            "use_cache": False,
+        },
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def test_parallel_questions_take_about_as_long_as_one(slow_model, fixture_db):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            resp = await client.post(
+                "/connect-database",
+                json={
+                    "db_type": "sqlite",
+                    "db_name": fixture_db,
+                    "table_names": ["students", "courses", "enrollments"],
+                },
+            )
+            resp.raise_for_status()
+            session_id = resp.json()["session_id"]
+
+            start = time.perf_counter()
+            await _ask(client, session_id, DEFAULT_QUESTIONS[0])
+            one = time.perf_counter() - start
+
+            questions = [DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)] for i in range(8)]
+            start = time.perf_counter()
+            answers = await asyncio.gather(*(_ask(client, session_id, q) for q in questions))
+            parallel = time.perf_counter() - start
+
+            await client.delete(f"/session/{session_id}")
+        return one, parallel, answers
+
+    one, parallel, answers = asyncio.run(run())
+    assert all(answer["status"] == "success" for answer in answers)
+    # Serialized, 8 questions would take 8x as long as one
+    assert parallel < one * 2.5, (one, parallel)
@@ -0,0 +1,126 @@
+import sqlite3
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from langchain_community.utilities import SQLDatabase
+
+import main
+from cost_guard import explain, guard_query
+from query_execution import execute_query, validate_and_execute_query
+
+
+@pytest.fixture(scope="module")
+def db(fixture_db):
+    return SQLDatabase.from_uri(f"sqlite:///{fixture_db}")
+
+
+def _estimate(db, query):
+    with db._engine.connect() as conn:
+        return explain(conn, query, "sqlite")["rows"]
+
+
+def _actual(fixture_db, query):
+    with sqlite3.connect(fixture_db) as conn:
+        return len(conn.execute(query).fetchall())
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # Range search on one side of a self-join: both sides count
+        "SELECT s1.name FROM students s1 JOIN students s2 WHERE s1.student_id > 0",
+        "SELECT s.name, e.grade FROM students s JOIN enrollments e "
+        "ON e.student_id = s.student_id",
+        "SELECT * FROM students WHERE student_id = 5",
+        "SELECT grade, COUNT(*) FROM enrollments GROUP BY grade",
+        "SELECT DISTINCT department FROM courses",
+        "SELECT COUNT(*) FROM students s1, students s2",
+        "SELECT * FROM students LIMIT 10",
+        "SELECT * FROM (SELECT student_id, COUNT(*) AS n FROM enrollments "
+        "GROUP BY student_id ORDER BY n DESC LIMIT 5) x JOIN students s USING (student_id)",
+        "SELECT title FROM courses UNION ALL SELECT name FROM students",
+    ],
+)
+def test_sqlite_estimate_is_close_to_the_output(db, fixture_db, query):
+    estimate, actual = _estimate(db, query), _actual(fixture_db, query)
+    assert actual / 2 <= estimate <= max(actual * 2, 10)
+
+
+def test_limit_action_keeps_the_result_truncated(db):
+    limits = SimpleNamespace(max_estimated_rows=100, max_estimated_cost=0, cost_action="limit")
+    query = "SELECT s1.name FROM students s1 JOIN students s2"
+
+    limited, notice = guard_query(db, query, "sqlite", limits, limit_rows=50)
+    assert "LIMIT 51" in limited
+    assert notice["message"].endswith("limited to 50 rows")
+
+    columns, rows, cursor, notice = execute_query(
+        db, query, db_type="sqlite", limits=limits, max_rows=50
+    )
+    try:
+        assert len(rows) == 50 and cursor is not None and notice is not None
+    finally:
+        cursor.close()
+
+
+def test_guard_rewrite_is_reported_but_not_returned_as_final_sql(db):
+    limits = SimpleNamespace(max_estimated_rows=100, max_estimated_cost=0, cost_action="limit")
+    query = "SELECT * FROM enrollments"
+    success, result, final_query, _ = asyncio.run(
+        validate_and_execute_query(
+            query, db, "sqlite", "", max_retries=0, max_rows=50, limits=limits
+        )
+    )
+    assert success and final_query == query
+    assert "LIMIT 51" in result["executed_query"]
+    assert len(result["rows"]) == 50 and result["truncated"]
+    # Nothing past the guard's LIMIT was selected, so there is nothing to page
+    assert result["cursor"] is None
+
+
+def test_cached_sql_is_not_limited_by_another_sessions_guard(slow_model, fixture_db):
+    slow_model.fixtures["show all enrollments"] = "SELECT * FROM enrollments"
+    tables = ["students", "courses", "enrollments"]
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            answers = []
+            for limits in (
+                {"max_rows": 100, "max_estimated_rows": 3000},
+                {"max_rows": 100000},
+            ):
+                resp = await client.post(
+                    "/connect-database",
+                    json={
+                        "db_type": "sqlite",
+                        "db_name": fixture_db,
+                        "table_names": tables,
+                        "limits": limits,
+                    },
+                )
+                session_id = resp.json()["session_id"]
+                resp = await client.post(
+                    "/ask-question",
+                    json={
+                        "session_id": session_id,
+                        "question": "Show all enrollments",
+                        "used_model": {"model_type": "Stub"},
+                        "use_cache": True,
+                    },
+                )
+                answers.append(resp.json())
+                await client.delete(f"/session/{session_id}")
+        return answers
+
+    limited, full = asyncio.run(run())
+    with sqlite3.connect(fixture_db) as conn:
+        total = conn.execute("SELECT COUNT(*) FROM enrollments").fetchone()[0]
+
+    assert limited["truncated"] and limited["result_id"] is None
+    assert "LIMIT 101" in limited["generated_sql"] and limited["cost_warning"]
+    assert full["sql_cache"] == "hit"
+    assert full["row_count"] == total and not full["truncated"]
+    assert "LIMIT" not in full["generated_sql"]
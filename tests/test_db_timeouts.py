@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_community.utilities import SQLDatabase
+
+import utils
+from db_timeouts import QueryCancelledError, QueryHandle, StatementTimeoutError
+from query_execution import execute_query
+from utils import ClientDisconnected, cancel_on_disconnect
+
+# Never finishes on its own
+ENDLESS = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+    "SELECT COUNT(*) FROM c"
+)
+
+
+@pytest.fixture
+def db(fixture_db):
+    return SQLDatabase.from_uri(f"sqlite:///{fixture_db}")
+
+
+def test_sqlite_statement_timeout(db):
+    start = time.perf_counter()
+    with pytest.raises(StatementTimeoutError):
+        execute_query(db, ENDLESS, db_type="sqlite", handle=QueryHandle("sqlite", 0.5))
+    assert time.perf_counter() - start < 5
+
+
+def test_cancel_interrupts_a_running_query(db):
+    handle = QueryHandle("sqlite", 0)
+    threading.Timer(0.3, handle.cancel).start()
+    start = time.perf_counter()
+    with pytest.raises(QueryCancelledError):
+        execute_query(db, ENDLESS, db_type="sqlite", handle=handle)
+    assert time.perf_counter() - start < 5
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after: float):
+        self.disconnect_at = time.monotonic() + disconnect_after
+
+    async def is_disconnected(self):
+        return time.monotonic() >= self.disconnect_at
+
+
+def test_disconnect_cancels_the_pipeline(monkeypatch):
+    monkeypatch.setattr(utils, "DISCONNECT_POLL_SECONDS", 0.01)
+    cancelled = []
+
+    async def pipeline():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        with pytest.raises(ClientDisconnected):
+            await cancel_on_disconnect(FakeRequest(0.1), pipeline())
+
+    asyncio.run(run())
+    assert cancelled == [True]
+
+
+def test_finished_pipeline_returns_its_result(monkeypatch):
+    monkeypatch.setattr(utils, "DISCONNECT_POLL_SECONDS", 0.01)
+
+    async def pipeline():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    assert asyncio.run(cancel_on_disconnect(FakeRequest(10), pipeline())) == "answer"
@@ -0,0 +1,16 @@
+import pytest
+
+from result_format import unique_columns
+
+
+@pytest.mark.parametrize(
+    "columns, expected",
+    [
+        (["id", "name"], ["id", "name"]),
+        (["id", "id", "id"], ["id", "id_1", "id_2"]),
+        (["id", "id", "id_1"], ["id", "id_2", "id_1"]),
+        (["id_1", "id", "id"], ["id_1", "id", "id_2"]),
+    ],
+)
+def test_unique_columns(columns, expected):
+    assert unique_columns(columns) == expected
@@ -0,0 +1,135 @@
+import threading
+import asyncio
+import time
+import os
+
+import httpx
+
+from result_store import OpenCursor, ResultStore
+from session_store import SQLiteSessionBackend
+
+
+class FakeResult:
+    def __init__(self, rows, gate=None):
+        self.rows = list(rows)
+        self.gate = gate
+        self.closed = False
+
+    def fetchmany(self, size):
+        if self.gate is not None:
+            self.gate.wait()
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConn:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _cursor(rows, gate=None):
+    return OpenCursor(FakeConn(), FakeResult(rows, gate), [])
+
+
+def test_spilled_pages_are_readable_and_connection_released():
+    store = ResultStore(ttl_seconds=0)
+    cursor = _cursor([(i,) for i in range(25)])
+    result_id = store.register("s", ["n"], 10, cursor)
+    store.executor.shutdown(wait=True)
+
+    entry = store.get(result_id)
+    assert entry["done"] and entry["rows"] == 25
+    assert store.read_page(entry, 1) == [(i,) for i in range(10)]
+    assert store.read_page(entry, 3) == [(20,), (21,), (22,), (23,), (24,)]
+    assert store.read_page(entry, 4) is None
+    assert cursor.conn.closed and cursor.result.closed
+    store.close()
+
+
+def test_excess_spills_are_refused_and_their_cursors_closed():
+    gate = threading.Event()
+    store = ResultStore(ttl_seconds=0, max_pending=1)
+    first = store.register("s", ["n"], 1, _cursor([(1,), (2,)], gate))
+    extra = _cursor([(1,), (2,)])
+    assert first is not None
+    assert store.register("s", ["n"], 1, extra) is None
+    assert extra.conn.closed
+    gate.set()
+    store.close()
+
+
+def test_drop_while_spilling_removes_the_file_without_waiting():
+    gate = threading.Event()
+    store = ResultStore(ttl_seconds=0)
+    result_id = store.register("s", ["n"], 1, _cursor([(1,), (2,), (3,)], gate))
+    path = store.get(result_id)["path"]
+
+    store.drop(result_id)
+    assert store.get(result_id) is None
+    gate.set()
+    store.executor.shutdown(wait=True)
+
+    assert not os.path.exists(path)
+
+
+def test_pages_are_served_by_another_worker(tmp_path):
+    index = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    owner, other = ResultStore(ttl_seconds=0), ResultStore(ttl_seconds=0)
+    owner.share(index)
+    other.share(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+
+    result_id = owner.register("s", ["n"], 10, _cursor([(i,) for i in range(25)]))
+    owner.executor.shutdown(wait=True)
+
+    entry = other.get(result_id)
+    assert entry["done"] and entry["columns"] == ["n"] and len(entry["pages"]) == 3
+    assert other.read_page(entry, 2) == [(i,) for i in range(10, 20)]
+
+    owner.drop(result_id)
+    assert other.get(result_id) is None
+    owner.close()
+    other.close()
+
+
+def test_expired_shared_results_are_ignored_and_purged(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    owner, other = ResultStore(ttl_seconds=0), ResultStore(ttl_seconds=60)
+    owner.share(SQLiteSessionBackend(path))
+    other.share(SQLiteSessionBackend(path))
+
+    result_id = owner.register("s", ["n"], 1, _cursor([(1,), (2,)]))
+    owner.executor.shutdown(wait=True)
+    spill = owner.get(result_id)
+    # Left behind by a worker that died long ago
+    owner.shared.put_result(result_id, dict(spill, created_at=time.time() - 3600))
+
+    assert other.get(result_id) is None
+    other.purge_expired()
+    assert owner.shared.get_result(result_id) is None
+    assert not os.path.exists(spill["path"])
+    owner.close()
+    other.close()
+
+
+def test_page_request_gives_up_on_a_stalled_spill(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "RESULT_PAGE_WAIT_SECONDS", 0.2)
+    gate = threading.Event()
+    result_id = main.result_store.register("s", ["n"], 1, _cursor([(1,), (2,)], gate))
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            return await client.get(f"/result/{result_id}/page", params={"page": 2})
+
+    try:
+        assert asyncio.run(fetch()).status_code == 504
+    finally:
+        gate.set()
+        main.result_store.drop(result_id)
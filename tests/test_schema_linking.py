@@ -0,0 +1,37 @@
+import pytest
+from langchain_community.utilities import SQLDatabase
+
+from schema_linking import is_explicit_question
+from schema_snapshot import build_schema_snapshot
+
+
+@pytest.fixture(scope="module")
+def link_index(fixture_db):
+    db = SQLDatabase.from_uri(f"sqlite:///{fixture_db}")
+    return build_schema_snapshot(db)["link_index"]
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Count the students",
+        "List the email of every student",
+        "What is the average grade in enrollments?",
+        "Show course titles and credits",
+    ],
+)
+def test_explicit_questions(link_index, question):
+    assert is_explicit_question(link_index, question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Which courses are hard?",
+        "Show me students who struggle",
+        "What about enrollments last spring?",
+        "Who are the best students?",
+    ],
+)
+def test_vague_questions_are_not_explicit(link_index, question):
+    assert not is_explicit_question(link_index, question)
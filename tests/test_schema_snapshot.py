@@ -0,0 +1,46 @@
+import asyncio
+import shutil
+import sqlite3
+
+from langchain_community.utilities import SQLDatabase
+
+import schema_snapshot
+from schema_snapshot import build_schema_snapshot, get_schema
+
+
+def _snapshot(path):
+    return build_schema_snapshot(SQLDatabase.from_uri(f"sqlite:///{path}"))
+
+
+def test_fingerprint_ignores_sample_rows_but_not_columns(fixture_db, tmp_path):
+    path = str(tmp_path / "copy.db")
+    shutil.copy(fixture_db, path)
+    before = _snapshot(path)
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM courses")
+        conn.execute("INSERT INTO courses VALUES (1, 'New title', 'Art', 5)")
+    rows_changed = _snapshot(path)
+    assert rows_changed["table_info"] != before["table_info"]
+    assert rows_changed["fingerprint"] == before["fingerprint"]
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("ALTER TABLE courses ADD COLUMN room TEXT")
+    assert _snapshot(path)["fingerprint"] != before["fingerprint"]
+
+
+def test_expired_snapshot_is_refreshed_and_saved(fixture_db, monkeypatch):
+    monkeypatch.setattr(schema_snapshot, "SCHEMA_TTL_SECONDS", 1)
+    db = SQLDatabase.from_uri(f"sqlite:///{fixture_db}")
+    stale = dict(build_schema_snapshot(db), built_at=0)
+    session_data = {"db": db, "schema": stale}
+    saved = []
+
+    async def run():
+        assert get_schema(session_data, save=lambda: saved.append(1)) is stale
+        assert schema_snapshot._refresh_tasks
+        await asyncio.gather(*schema_snapshot._refresh_tasks)
+
+    asyncio.run(run())
+    assert session_data["schema"]["built_at"] > 0
+    assert saved == [1] and "schema_refreshing" not in session_data
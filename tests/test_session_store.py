@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+import threading
+import asyncio
+
+import pytest
+
+import session_store
+from session_store import MemorySessionBackend, SQLiteSessionBackend, SessionStore
+
+
+def _session(table="students"):
+    config = SimpleNamespace(model_dump=lambda: {"db_type": "sqlite", "db_name": "x.db"})
+    limits = SimpleNamespace(model_dump=lambda: {"max_rows": None})
+    return {
+        "config": config,
+        "db_type": "sqlite",
+        "table_names": [table],
+        "schema": {"fingerprint": table, "table_info": f"CREATE TABLE {table} (id INT)"},
+        "limits": limits,
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionBackend()
+    return SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+
+
+def test_lru_eviction_deletes_the_record(backend):
+    evicted = []
+    store = SessionStore(
+        on_evict=lambda sid, data: evicted.append(sid),
+        ttl_seconds=0,
+        max_sessions=2,
+        backend=backend,
+    )
+    for i in range(5):
+        store.add(f"s{i}", _session())
+        store.get("s0")  # keep s0 recently used
+
+    assert store.count() == 2
+    assert store.stats()["sessions"] == 2
+    assert store.load("s0") is not None and store.load("s4") is not None
+    assert evicted == ["s1", "s2", "s3"]
+    assert store.load("s1") is None
+
+
+def test_memory_budget_eviction_deletes_the_record(backend):
+    store = SessionStore(ttl_seconds=0, max_sessions=0, max_bytes=1, backend=backend)
+    store.add("a", _session("a"))
+    store.add("b", _session("b"))
+    assert store.load("a") is None and store.load("b") is not None
+
+
+def test_pop_deletes_everywhere(backend):
+    store = SessionStore(ttl_seconds=0, backend=backend)
+    store.add("a", _session())
+    assert store.pop("a")["table_names"] == ["students"]
+    assert store.pop("a", None) is None
+    assert store.count() == 0
+
+
+def test_get_touches_the_backend_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_TOUCH_SECONDS", 0)
+    backend = MemorySessionBackend()
+    touched = []
+    backend.touch = lambda sid: touched.append(threading.current_thread())
+    store = SessionStore(ttl_seconds=0, backend=backend)
+    store.add("a", _session())
+
+    async def use():
+        assert store.get("a") is not None
+        await asyncio.sleep(0.05)
+
+    asyncio.run(use())
+    assert touched and touched[0] is not threading.main_thread()
+
+
+def _workers(tmp_path, evicted):
+    path = str(tmp_path / "sessions.db")
+    return [
+        SessionStore(
+            on_evict=lambda sid, data: evicted.append(sid),
+            ttl_seconds=0,
+            backend=SQLiteSessionBackend(path),
+        )
+        for _ in range(2)
+    ]
+
+
+def test_session_deleted_by_another_worker_is_dropped(tmp_path):
+    evicted = []
+    a, b = _workers(tmp_path, evicted)
+    a.add("s", _session())
+    b.attach("s", _session(), b.load("s")["version"])
+    assert b.is_current("s")
+
+    a.pop("s")
+    assert not b.save("s")  # does not recreate the deleted record
+    assert b.load("s") is None and b.get("s") is None
+    assert evicted == ["s"]
+
+
+def test_session_reconnected_by_another_worker_is_reloaded(tmp_path):
+    evicted = []
+    a, b = _workers(tmp_path, evicted)
+    a.add("s", _session())
+    b.attach("s", _session(), b.load("s")["version"])
+
+    a.add("s", _session("courses"))
+    assert not b.is_current("s") and b.get("s") is None
+    assert b.load("s")["table_names"] == ["courses"]
+    assert evicted == ["s"]
+
+
+def test_save_keeps_the_saving_worker_current(tmp_path):
+    a, b = _workers(tmp_path, [])
+    a.add("s", _session())
+    b.attach("s", _session(), b.load("s")["version"])
+
+    assert a.save("s")
+    assert a.is_current("s") and not b.is_current("s")
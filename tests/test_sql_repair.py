@@ -0,0 +1,80 @@
+import sqlite3
+import asyncio
+
+import pytest
+from langchain_community.utilities import SQLDatabase
+
+from sql_repair import repair_sql
+from query_execution import validate_and_execute_query
+
+NOT_IN_QUERY = (
+    "SELECT name FROM students WHERE student_id NOT IN "
+    "(SELECT student_id FROM enrollments WHERE enrolled_at > '2022-01-01')"
+)
+
+
+def test_misspelled_table_and_column(column_index):
+    fixed, fixes = repair_sql("SELECT emial FROM studnets", "sqlite", column_index)
+    assert fixed == "SELECT email FROM students"
+    assert len(fixes) == 2
+
+
+def test_misspelled_column_inside_subquery(column_index):
+    fixed, _ = repair_sql(
+        "SELECT name FROM students WHERE student_id IN "
+        "(SELECT student_id FROM enrollments WHERE enroled_at > '2022-01-01')",
+        "sqlite",
+        column_index,
+    )
+    assert "enrolled_at >" in fixed
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        NOT_IN_QUERY,
+        "SELECT name FROM students s WHERE EXISTS (SELECT 1 FROM enrollments e "
+        "WHERE e.student_id = s.student_id AND grade = 'A')",
+        "SELECT name FROM students s WHERE EXISTS (SELECT 1 FROM enrollments e "
+        "WHERE e.student_id = s.student_id AND email LIKE '%1')",
+    ],
+)
+def test_valid_subqueries_are_left_alone(query, column_index):
+    assert repair_sql(query, "sqlite", column_index) == (None, [])
+
+
+def test_never_renames_to_an_outer_scope_column(column_index):
+    # enrolled_onn is close to students.enrolled_on, which the subquery can
+    # only reach as a correlated reference: that is not a repair
+    query = (
+        "SELECT name FROM students s WHERE EXISTS (SELECT 1 FROM enrollments e "
+        "WHERE e.student_id = s.student_id AND enrolled_onn > '2022')"
+    )
+    fixed, _ = repair_sql(query, "sqlite", column_index)
+    assert fixed is None or "enrolled_on " not in fixed
+
+
+def test_limit_rewritten_for_tsql(column_index):
+    fixed, fixes = repair_sql("SELECT name FROM students LIMIT 5", "mssql", column_index)
+    assert "TOP 5" in fixed and fixes
+
+
+def test_not_in_subquery_returns_the_true_rows(fixture_db, column_index):
+    db = SQLDatabase.from_uri(f"sqlite:///{fixture_db}")
+    success, result, final_query, error_log = asyncio.run(
+        validate_and_execute_query(
+            NOT_IN_QUERY,
+            db,
+            "sqlite",
+            "",
+            max_retries=0,
+            max_rows=None,
+            schema_index=column_index,
+        )
+    )
+    with sqlite3.connect(fixture_db) as conn:
+        expected = conn.execute(NOT_IN_QUERY).fetchall()
+
+    assert success and error_log == []
+    assert final_query == NOT_IN_QUERY
+    assert len(result["rows"]) == len(expected)
@@ -0,0 +1,41 @@
+import pytest
+
+from pipeline_modes import DEFAULT_QUESTIONS
+from prompts import (
+    get_rephrase_and_sql_prompt_template,
+    get_sql_prompt_template,
+    question_rephrase,
+)
+from stub_model_server import STUB, canned_sql
+from Stub import StubLLM
+
+TABLE_INFO = """CREATE TABLE students (
+\tstudent_id INTEGER,
+\tname TEXT,
+\temail TEXT
+)"""
+
+
+@pytest.mark.parametrize("question", DEFAULT_QUESTIONS)
+def test_benchmark_stub_answers_both_pipeline_modes(question):
+    rephrased = STUB.respond(
+        question_rephrase.format(input=question, table_info=TABLE_INFO)
+    )
+    assert rephrased == question
+
+    sql_prompt = get_sql_prompt_template("sqlite").format(
+        input=question, table_info=TABLE_INFO
+    )
+    assert STUB.respond(sql_prompt) == canned_sql(question)
+
+    combined = get_rephrase_and_sql_prompt_template("sqlite").format(
+        input=question, table_info=TABLE_INFO
+    )
+    assert STUB.respond(combined) == f"{question}\nSQL Query: {canned_sql(question)}"
+
+
+def test_unknown_questions_get_a_rule_based_select():
+    prompt = get_sql_prompt_template("sqlite").format(
+        input="How many students are enrolled?", table_info=TABLE_INFO
+    )
+    assert StubLLM().respond(prompt) == "SELECT COUNT(*) FROM students;"
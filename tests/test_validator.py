@@ -0,0 +1,80 @@
+import pytest
+
+from utils import sqlglot_validate
+
+VALID = [
+    "SELECT name FROM students WHERE student_id IN "
+    "(SELECT student_id FROM enrollments WHERE grade = 'A')",
+    "SELECT name FROM students s WHERE EXISTS "
+    "(SELECT 1 FROM enrollments e WHERE e.student_id = s.student_id AND grade = 'A')",
+    "SELECT name, (SELECT COUNT(*) FROM enrollments e "
+    "WHERE e.student_id = s.student_id AND grade = 'A') AS n FROM students s",
+    "SELECT name FROM students WHERE student_id NOT IN "
+    "(SELECT student_id FROM enrollments WHERE enrolled_at > '2022-01-01')",
+    # Correlated: email only exists in the outer query's table
+    "SELECT name FROM students s WHERE EXISTS "
+    "(SELECT 1 FROM enrollments e WHERE e.student_id = s.student_id AND email LIKE '%x')",
+    "WITH a AS (SELECT student_id FROM enrollments) "
+    "SELECT name FROM students WHERE student_id IN (SELECT student_id FROM a)",
+    "SELECT c.title, COUNT(*) AS n FROM courses c "
+    "JOIN enrollments e ON e.course_id = c.course_id GROUP BY c.title ORDER BY n DESC",
+    "SELECT title FROM courses UNION SELECT name FROM students",
+]
+
+
+@pytest.mark.parametrize("query", VALID)
+def test_valid_queries_pass(query, column_index):
+    assert sqlglot_validate(query, column_index, "sqlite") == (True, None)
+
+
+@pytest.mark.parametrize(
+    "query, unknown",
+    [
+        ("SELECT name FROM students WHERE grade = 'A'", "grade"),
+        ("SELECT nmae FROM students", "nmae"),
+        ("SELECT s.grade FROM students s", "grade"),
+        (
+            "SELECT name FROM students s WHERE EXISTS (SELECT 1 FROM enrollments e "
+            "WHERE e.student_id = s.student_id AND bogus = 1)",
+            "bogus",
+        ),
+        (
+            "SELECT name FROM students WHERE student_id IN "
+            "(SELECT student_id FROM enrollments WHERE bogus = 1)",
+            "bogus",
+        ),
+        ("SELECT * FROM teachers", "teachers"),
+    ],
+)
+def test_unknown_identifiers_are_rejected(query, unknown, column_index):
+    valid, error = sqlglot_validate(query, column_index, "sqlite")
+    assert not valid
+    assert unknown in error
+
+
+def test_cartesian_join_without_where_is_rejected(column_index):
+    valid, error = sqlglot_validate(
+        "SELECT * FROM students, enrollments", column_index, "sqlite"
+    )
+    assert not valid and "CROSS JOIN" in error
+
+
+def test_syntax_error():
+    valid, error = sqlglot_validate("SELECT FROM WHERE", None, "sqlite")
+    assert not valid and error.startswith("SQL Syntax Error")
+
+
+@pytest.mark.parametrize(
+    "query, db_type, valid",
+    [
+        ('SELECT "Name" FROM students', "postgresql", False),
+        ('SELECT "name" FROM "students"', "postgresql", True),
+        ('SELECT s."Email" FROM students s', "postgresql", False),
+        ('SELECT name FROM "Students"', "postgresql", False),
+        ('SELECT "NAME" FROM "STUDENTS"', "oracle", True),
+        ('SELECT "name" FROM students', "oracle", False),
+        ('SELECT "Name" FROM students', "mysql", True),
+    ],
+)
+def test_quoted_identifiers_are_case_sensitive(query, db_type, valid, column_index):
+    assert sqlglot_validate(query, column_index, db_type)[0] is valid
@@ -0,0 +1,169 @@
+from datetime import datetime, timezone
+import contextvars
+import logging
+import asyncio
+import json
+import os
+
+logger = logging.getLogger("trace_log")
+
+TRACE_LOG_ENABLED = os.getenv("TRACE_LOG_ENABLED", "true").lower() == "true"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "requests.jsonl")
+# Rotate to TRACE_LOG_PATH.1 .. .N once the file passes this size
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "5"))
+# Records are written in batches of up to this many, at least every interval
+TRACE_LOG_BATCH_SIZE = int(os.getenv("TRACE_LOG_BATCH_SIZE", "256"))
+TRACE_LOG_FLUSH_SECONDS = float(os.getenv("TRACE_LOG_FLUSH_SECONDS", "1"))
+# Records queued beyond this are dropped rather than slowing requests down
+TRACE_LOG_QUEUE_SIZE = int(os.getenv("TRACE_LOG_QUEUE_SIZE", "10000"))
+
+# Trace of the request being handled by the current task, if any
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace(**fields) -> dict:
+    """Begin collecting a trace record for the current request"""
+    trace = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        **fields,
+        "stages": {},
+        "tokens": {"prompt": 0, "completion": 0, "calls": 0},
+    }
+    _current_trace.set(trace)
+    return trace
+
+
+def trace_set(**fields):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.update(fields)
+
+
+def trace_stage(name: str, seconds: float):
+    """Add seconds to a stage (correction rounds repeat stages)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        stages = trace["stages"]
+        stages[name] = round(stages.get(name, 0) + seconds, 6)
+
+
+def trace_tokens(prompt_tokens: int, completion_tokens: int):
+    trace = _current_trace.get()
+    if trace is not None:
+        tokens = trace["tokens"]
+        tokens["prompt"] += prompt_tokens
+        tokens["completion"] += completion_tokens
+        tokens["calls"] += 1
+
+
+class TraceLog:
+    """
+    Appends trace records to a JSONL file from a background task. write()
+    only enqueues; the writer batches records, appends each batch in a
+    worker thread and rotates the file by size, so the request path never
+    waits on disk. The file is reopened per batch, which keeps rotation
+    safe when several API workers share it.
+    """
+
+    def __init__(
+        self,
+        path: str = TRACE_LOG_PATH,
+        max_bytes: int = TRACE_LOG_MAX_BYTES,
+        backups: int = TRACE_LOG_BACKUPS,
+        enabled: bool = TRACE_LOG_ENABLED,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = enabled
+        self.written = 0
+        self.dropped = 0
+        self._queue = None
+        self._task = None
+        self._pending = []  # collected by the writer, not yet handed to disk
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=TRACE_LOG_QUEUE_SIZE)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and flush what is still queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        lines, self._pending = self._pending, []
+        while not self._queue.empty():
+            lines.append(self._queue.get_nowait())
+        if lines:
+            await asyncio.to_thread(self._append, lines)
+
+    def write(self, record: dict):
+        if self._task is None:
+            return
+        try:
+            line = json.dumps(record, default=str, ensure_ascii=False)
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self.dropped += 1
+        except Exception as e:
+            logger.warning(f"Could not serialize trace record: {e}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            lines = self._pending = [await self._queue.get()]
+            deadline = loop.time() + TRACE_LOG_FLUSH_SECONDS
+
+            while len(lines) < TRACE_LOG_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    lines.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._pending = []
+            try:
+                await asyncio.to_thread(self._append, lines)
+            except Exception as e:
+                self.dropped += len(lines)
+                logger.error(f"Could not write {len(lines)} trace records: {e}")
+
+    def _append(self, lines: list):
+        self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self.written += len(lines)
+
+    def _rotate(self):
+        if not self.max_bytes:
+            return
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return  # not created yet
+
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
@@ -4,20 +4,61 @@ import subprocess
 import time
 from langsmith import traceable
 import requests
+import httpx
 import sqlglot
+import os
+import contextvars
+import logging
+import asyncio
 from sqlglot import exp
+from sqlglot.optimizer.scope import traverse_scope
+from schema_linking import estimate_tokens
+from trace_log import trace_tokens
 
 
+logger = logging.getLogger("utils")
+
 OLLAMA_EXE = r"C:\Users\hasan\AppData\Local\Programs\Ollama\ollama app.exe"
 OLLAMA_URL = "http://127.0.0.1:11434"
 _port = 8001
 
+# main -> model_server transport. Connections are pooled and kept alive; when
+# MODEL_SERVER_SOCKET_DIR is set the model server listens on a Unix socket there.
+MODEL_CONNECT_TIMEOUT = float(os.getenv("MODEL_CONNECT_TIMEOUT", "5"))
+MODEL_READ_TIMEOUT = float(os.getenv("MODEL_READ_TIMEOUT", "0"))  # 0 = no limit
+MODEL_POOL_MAX_CONNECTIONS = int(os.getenv("MODEL_POOL_MAX_CONNECTIONS", "64"))
+MODEL_POOL_KEEPALIVE = int(os.getenv("MODEL_POOL_KEEPALIVE", "16"))
+MODEL_SERVER_SOCKET_DIR = os.getenv("MODEL_SERVER_SOCKET_DIR", "")
+
+_async_clients = {}
+_sync_clients = {}
+
+# How often long requests check whether their HTTP client is still there
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+# Port of the model server serving the current request (one per backend)
+_model_port = contextvars.ContextVar("model_port", default=None)
+
+
+def use_model_port(port: int):
+    """Route this request's model calls to the backend listening on port"""
+    _model_port.set(port)
+
+# Session db_type -> sqlglot dialect name
+SQLGLOT_DIALECTS = {
+    "mysql": "mysql",
+    "postgresql": "postgres",
+    "sqlite": "sqlite",
+    "oracle": "oracle",
+    "mssql": "tsql",
+}
+
 
 def normalize_sql_quotes(query: str) -> str:
     """Fix escaped quotes from LLM output"""
-
-    print("\n\n\n\n\n\n\n\n\n", query.replace('\\"', '"').strip(), "\n\n\n\n\n\n\n\n\n")
-    return query.replace('\\"', '"').strip()
+    normalized = query.replace('\\"', '"').strip()
+    logger.debug(f"Normalized SQL: {normalized}")
+    return normalized
 
 
 @traceable(name="extract_sql")
@@ -26,27 +67,35 @@ def extract_sql(text: str) -> str:
     # Match the first SELECT ... ; (non-greedy)
     m = re.search(r"(?is)\bSELECT\b.*?;", text)
     if m:
-        print(
-            "\n\n\n\n\n\n\n\n\n\n\n\n This is the extracted SQL:",
-            m.group(0).strip(),
-            "\n\n\n\n\n\n\n\n\n\n\n\n",
-        )
+        logger.debug(f"Extracted SQL: {m.group(0).strip()}")
         return m.group(0).strip()
 
     # Fallback: SELECT without semicolon
     m2 = re.search(r"(?is)\bSELECT\b.*", text)
     if m2:
-        print(
-            "\n\n\n\n\n\n\n\n\n\n\n\n This is the extracted SQL:",
-            m2.group(0).strip(),
-            "\n\n\n\n\n\n\n\n\n\n\n\n",
-        )
+        logger.debug(f"Extracted SQL (no semicolon): {m2.group(0).strip()}")
         return m2.group(0).strip()
 
     # If no SELECT found, return empty or raise error
     return ""
 
 
+def extract_rephrase_and_sql(text: str):
+    """
+    Split a single-call generation into (rephrased_question, sql). The prompt
+    ends with "Rephrased Question:", so the label may or may not be echoed.
+    """
+    text = re.sub(r"(?is)^\s*rephrased question:", "", text)
+    m = re.search(r"(?is)\bSQL Query:", text)
+    if m:
+        rephrased = text[: m.start()].strip().strip('"')
+        sql = extract_sql(text[m.end() :])
+    else:
+        rephrased = ""
+        sql = extract_sql(text)
+    return rephrased, sql
+
+
 def extract_thinking_and_answer(response: str):
     """
     Extracts the reasoning (thinking) part and the clean final answer
@@ -90,12 +139,133 @@ def to_text(msg):
         return str(msg)
 
 
+def _resolve_port(port: int = None) -> int:
+    return port or _model_port.get() or _port
+
+
+def model_server_socket(port: int = None) -> str:
+    """Unix socket path of the model server on a port ("" when using TCP)"""
+    if not MODEL_SERVER_SOCKET_DIR:
+        return ""
+    return os.path.join(
+        MODEL_SERVER_SOCKET_DIR, f"model_server_{_resolve_port(port)}.sock"
+    )
+
+
+def model_server_url(port: int = None) -> str:
+    return f"http://127.0.0.1:{_resolve_port(port)}"
+
+
+def _model_timeout():
+    return httpx.Timeout(
+        connect=MODEL_CONNECT_TIMEOUT,
+        read=MODEL_READ_TIMEOUT or None,
+        write=MODEL_CONNECT_TIMEOUT,
+        pool=None,
+    )
+
+
+def _model_limits():
+    return httpx.Limits(
+        max_connections=MODEL_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=MODEL_POOL_KEEPALIVE,
+    )
+
+
+def get_async_client(port: int = None) -> httpx.AsyncClient:
+    """Shared keep-alive client for async calls to the model server on a port"""
+    port = _resolve_port(port)
+    client = _async_clients.get(port)
+    if client is None:
+        socket_path = model_server_socket(port)
+        transport = httpx.AsyncHTTPTransport(uds=socket_path) if socket_path else None
+        client = httpx.AsyncClient(
+            base_url=model_server_url(port),
+            timeout=_model_timeout(),
+            limits=_model_limits(),
+            transport=transport,
+        )
+        _async_clients[port] = client
+    return client
+
+
+def get_sync_client(port: int = None) -> httpx.Client:
+    """Shared keep-alive client for blocking calls (health checks, startup polling)"""
+    port = _resolve_port(port)
+    client = _sync_clients.get(port)
+    if client is None:
+        socket_path = model_server_socket(port)
+        transport = httpx.HTTPTransport(uds=socket_path) if socket_path else None
+        client = httpx.Client(
+            base_url=model_server_url(port),
+            timeout=_model_timeout(),
+            limits=_model_limits(),
+            transport=transport,
+        )
+        _sync_clients[port] = client
+    return client
+
+
+async def close_model_clients():
+    for client in _async_clients.values():
+        await client.aclose()
+    for client in _sync_clients.values():
+        client.close()
+    _async_clients.clear()
+    _sync_clients.clear()
+
+
 # @traceable(name="extract_sql")
-def call_model(prompt: str, max_tokens: int = 1024):
-    url = "http://127.0.0.1:8001/generate"
-    resp = requests.post(url, json={"prompt": prompt, "max_tokens": max_tokens})
+async def call_model(prompt: str, max_tokens: int = 1024):
+    """Send a prompt to the model server without blocking the event loop"""
+    resp = await get_async_client().post(
+        "/generate", json={"prompt": prompt, "max_tokens": max_tokens}
+    )
     resp.raise_for_status()
-    return resp.json()["text"]
+    text = resp.json()["text"]
+    # The model server reports no usage, so counts are estimates
+    trace_tokens(estimate_tokens(prompt), estimate_tokens(to_text(text)))
+    return text
+
+
+async def stream_model(prompt: str, max_tokens: int = 1024):
+    """Yield text chunks from the model server as they are generated"""
+    payload = {"prompt": prompt, "max_tokens": max_tokens, "stream": True}
+    chunks = []
+    try:
+        async with get_async_client().stream("POST", "/generate", json=payload) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.aiter_text():
+                if chunk:
+                    chunks.append(chunk)
+                    yield chunk
+    finally:
+        trace_tokens(estimate_tokens(prompt), estimate_tokens("".join(chunks)))
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before its request finished"""
+
+
+async def cancel_on_disconnect(request, awaitable):
+    """
+    Await awaitable for a Starlette request, cancelling it (and whatever DB
+    query or model call it is waiting on) if the client disconnects first.
+    Raises ClientDisconnected in that case.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.wait({task})
+                raise ClientDisconnected("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()  # our own caller was cancelled
 
 
 def is_ollama_running():
@@ -143,46 +313,228 @@ def stop_ollama():
     )
 
 
-def sqlglot_validate(query, schema):
+def canonicalize_sql(query: str, db_type: str = "") -> str:
     """
-    schema = db.table_info  → {table: [columns]}
+    Canonical text for a query (keyword case, whitespace, trailing semicolon)
+    so equivalent spellings share cache entries.
+    """
+    dialect = SQLGLOT_DIALECTS.get(db_type.lower())
+    try:
+        return sqlglot.parse_one(query, read=dialect).sql(dialect=dialect)
+    except Exception:
+        return " ".join(query.rstrip().rstrip(";").split())
+
+
+def build_column_index(columns: dict) -> dict:
+    """
+    {table: [columns]} -> {table_lower: {"name": table, "columns":
+    {column_lower: column}}} for O(1) identifier checks in sqlglot_validate
+    (plain dicts, kept in the snapshot)
+    """
+    return {
+        table.lower(): {
+            "name": table,
+            "columns": {column.lower(): column for column in table_columns},
+        }
+        for table, table_columns in columns.items()
+    }
+
+
+def _known_columns(index: dict, table: str) -> str:
+    names = list(index[table]["columns"].values()) if table in index else []
+    text = ", ".join(names[:20])
+    if len(names) > 20:
+        text += f", ... ({len(names) - 20} more)"
+    return text
+
+
+def _check_joins(parsed) -> str:
+    """Reject cartesian products: joins with no condition in a query without WHERE"""
+    for join in parsed.find_all(exp.Join):
+        if join.method or not isinstance(join.this, exp.Table):
+            continue  # NATURAL joins, LATERAL / UNNEST sources
+        on = join.args.get("on")
+        if join.args.get("using") or (on is not None and not isinstance(on, exp.Boolean)):
+            continue
+        select = join.find_ancestor(exp.Select)
+        if select is not None and select.args.get("where"):
+            continue  # comma join / CROSS JOIN filtered in WHERE
+        kind = "CROSS JOIN" if join.kind.upper() == "CROSS" else "JOIN"
+        return (
+            f"Unsafe {kind} on table '{join.this.name}': no ON clause and no WHERE "
+            "condition, this returns every row combination (refusing to execute)"
+        )
+    return None
+
+
+def scope_columns(scope) -> list:
+    """
+    Columns that belong to scope's own SELECT. sqlglot also lists the columns
+    of IN / EXISTS / scalar subqueries under the enclosing scope; those are
+    checked in the subquery's own scope.
+    """
+    return [
+        column
+        for column in scope.columns
+        if column.find_ancestor(exp.Select) is scope.expression
+    ]
+
+
+def scope_tables(scope, index: dict):
+    """
+    ({alias: table} of the indexed tables scope selects from, opaque) where
+    opaque means a derived table, CTE or unindexed table is also a source
+    """
+    tables = {}
+    opaque = False
+    for source in scope.selected_sources.values():
+        node = source[1]
+        if isinstance(node, exp.Table) and node.name.lower() in index:
+            tables[node.alias_or_name.lower()] = node.name.lower()
+        else:
+            opaque = True
+    return tables, opaque
+
+
+def is_outer_column(scope, index: dict, name: str) -> bool:
+    """Whether an unqualified column may be a correlated outer reference"""
+    current = scope.parent
+    while current is not None:
+        tables, opaque = scope_tables(current, index)
+        if opaque or any(name in index[t]["columns"] for t in tables.values()):
+            return True
+        current = current.parent
+    return False
+
+
+# Dialects where a "quoted" identifier must match the stored name exactly
+CASE_SENSITIVE_QUOTES = {"postgres", "oracle"}
+
+
+def _quoted_name(name: str, dialect: str) -> str:
+    """How a reflected name is spelled inside quotes"""
+    if dialect == "oracle" and name == name.lower():
+        return name.upper()  # SQLAlchemy lower-cases Oracle's case-insensitive names
+    return name
+
+
+def _known(names: dict, identifier, dialect: str) -> bool:
+    """Whether identifier (a sqlglot Table or Column) names one of names"""
+    stored = names.get(identifier.name.lower())
+    if stored is None:
+        return False
+    if identifier.this.args.get("quoted") and dialect in CASE_SENSITIVE_QUOTES:
+        return identifier.name == _quoted_name(stored, dialect)
+    return True
+
+
+def _check_identifiers(parsed, index: dict, dialect: str) -> str:
+    ctes = {cte.alias_or_name.lower() for cte in parsed.find_all(exp.CTE)}
+    table_names = {key: entry["name"] for key, entry in index.items()}
+
+    for table in parsed.find_all(exp.Table):
+        name = table.name.lower()
+        if not name or table.args.get("db") or name in ctes:
+            continue  # other schemas and CTEs are not in the index
+        if not _known(table_names, table, dialect):
+            return (
+                f"Unknown table '{table.name}'. "
+                f"Available tables: {', '.join(sorted(index))}"
+            )
+
+    for scope in traverse_scope(parsed):
+        aliases = set()
+        if isinstance(scope.expression, exp.Select):
+            aliases = {s.alias.lower() for s in scope.expression.selects if s.alias}
+
+        # Real tables this scope can resolve unqualified columns against
+        tables, opaque = scope_tables(scope, index)
+
+        for column in scope_columns(scope):
+            if isinstance(column.this, exp.Star):
+                continue
+            name = column.name.lower()
+            qualifier = column.table.lower()
+
+            if qualifier:
+                source = None
+                current = scope
+                while current is not None and source is None:
+                    sources = {k.lower(): v for k, v in current.sources.items()}
+                    source = sources.get(qualifier)
+                    current = current.parent
+                if source is None:
+                    return (
+                        f"Unknown table or alias '{column.table}' "
+                        f"for column '{column.table}.{column.name}'"
+                    )
+                if not isinstance(source, exp.Table):
+                    continue
+                table = source.name.lower()
+                if table in index and not _known(index[table]["columns"], column, dialect):
+                    return (
+                        f"Unknown column '{column.name}' in table '{source.name}'. "
+                        f"Columns of {source.name}: {_known_columns(index, table)}"
+                    )
+                continue
+
+            if opaque or not tables or name in aliases:
+                continue
+            if dialect == "sqlite" and column.this.args.get("quoted"):
+                continue  # SQLite reads unknown "quoted" identifiers as strings
+            if any(
+                _known(index[table]["columns"], column, dialect)
+                for table in tables.values()
+            ):
+                continue
+            if is_outer_column(scope, index, name):
+                continue  # correlated reference to an outer query
+            return f"Unknown column '{column.name}' in " + "; ".join(
+                f"{table} ({_known_columns(index, table)})"
+                for table in sorted(set(tables.values()))
+            )
+
+    return None
+
+
+def sqlglot_validate(query, schema=None, db_type: str = ""):
+    """
+    Static checks before a query reaches the database: syntax (in the
+    session's dialect), unknown tables and columns resolved through aliases
+    against schema, a build_column_index() index, and cartesian joins.
     Returns (is_valid, error_message)
     """
+    dialect = SQLGLOT_DIALECTS.get(db_type.lower())
     try:
-        parsed = sqlglot.parse_one(query)
+        parsed = sqlglot.parse_one(query, read=dialect)
     except Exception as e:
         return False, f"SQL Syntax Error: {str(e)}"
 
-    # TABLE VALIDATION
-    # available_tables = set(schema.keys())
-    # referenced_tables = [t.name for t in parsed.find_all(exp.Table)]
-
-    # for t in referenced_tables:
-    #     if t not in available_tables:
-    #         return False, f"Unknown table '{t}'"
+    if parsed is None:
+        return False, "SQL Syntax Error: empty query"
 
-    # COLUMN VALIDATION
-    # for col in parsed.find_all(exp.Column):
-    #     table = col.table
-    #     colname = col.name
+    error = _check_joins(parsed)
+    if error:
+        return False, error
 
-    #     if table in schema:
-    #         if colname not in schema[table]:
-    #             return False, f"Unknown column '{colname}' in table '{table}'"
-    #     # if unqualified column → skip (optional)
-
-    # DETECT CROSS JOIN
-    # for join in parsed.find_all(exp.Join):
-    #     if join.args.get("kind") == "cross":
-    #         return False, "Unsafe CROSS JOIN detected (refusing to execute)"
-    #     if not join.args.get("on"):
-    #         return False, "JOIN missing ON clause (implicit CROSS JOIN)"
+    if isinstance(schema, dict) and schema:
+        try:
+            error = _check_identifiers(parsed, schema, dialect)
+        except Exception as e:
+            # Scope analysis does not cover every statement; let the DB decide
+            logger.debug(f"Identifier check skipped: {e}")
+            error = None
+        if error:
+            return False, error
 
     return True, None
 
-def is_model_server_running():
+def model_server_health(port: int = None, timeout: float = 0.3):
+    """GET /healthz on the model server; returns its JSON or None if unreachable"""
     try:
-        r = requests.get(f"http://127.0.0.1:{_port}/docs", timeout=0.3)
-        return r.status_code == 200
-    except:
-        return False
\ No newline at end of file
+        r = get_sync_client(port).get("/healthz", timeout=timeout)
+        if r.status_code == 200:
+            return r.json()
+    except Exception:
+        pass
+    return None